@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import argparse
+import os
+
+import pandas as pd
+
+from ncaa_predict.backtest import DEFAULT_BATCH_SIZE, backtest
+from ncaa_predict.util import list_arg
+
+
+DESCRIPTION = (
+    "Evaluate several models against several years' games in parallel and "
+    "print the accuracy, AUC and log loss of each model in each year."
+)
+
+COLUMNS = ["model", "year", "games", "accuracy", "auc", "log_loss"]
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--model-in",
+        "-m",
+        required=True,
+        action="append",
+        help="A model to evaluate. Can be given more than once.",
+    )
+    parser.add_argument(
+        "--years",
+        "-y",
+        required=True,
+        type=list_arg(type=int),
+        help="A comma-separated list of years to evaluate on.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=None,
+        type=int,
+        help="The number of worker processes. (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help="The number of games to predict at once. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--out",
+        "-o",
+        default=None,
+        help="Save the results to this CSV file. (default: don't save)",
+    )
+
+
+def main(args):
+    n_tasks = len(args.model_in) * len(args.years)
+    rows = []
+    for result in backtest(args.model_in, args.years, args.jobs, args.batch_size):
+        rows.append(result)
+        print(
+            "[%d/%d] %s %s: accuracy %.4f"
+            % (
+                len(rows),
+                n_tasks,
+                os.path.basename(result["model"]),
+                result["year"],
+                result["accuracy"],
+            )
+        )
+
+    results = pd.DataFrame(rows, columns=COLUMNS).sort_values(["model", "year"])
+    # Each season counts the same regardless of how many games it had
+    summary = results.groupby("model")[["accuracy", "auc", "log_loss"]].mean()
+    with pd.option_context("display.float_format", "{:.4f}".format):
+        print()
+        print(results.to_string(index=False))
+        print("\nMean over years:")
+        print(summary.to_string())
+    if args.out is not None:
+        results.to_csv(args.out, index=False, float_format="%.6f")
+        print("Saved results to %s" % args.out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Compares the latency of running a model with Keras (predict() and
+# predict_on_batch()) and with the NumPy engine from ./export_model.py, for a
+# single game and for large batches. Uses an untrained model with the same
+# architecture as train.py unless --model-in is given.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ncaa_predict import numpy_model
+from ncaa_predict.data_loader import N_FEATURES, N_PLAYERS
+from ncaa_predict.util import list_arg
+
+
+DEFAULT_BATCH_SIZES = [1, 64, 10000]
+# Keep calling each engine until this many seconds have passed
+DEFAULT_MIN_TIME = 1.0
+
+
+# Returns the median seconds per call of func, after one call to warm up
+def time_calls(func, min_time):
+    func()
+    times = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time or len(times) < 3:
+        call_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - call_start)
+    return float(np.median(times))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model-in",
+        "-m",
+        default=None,
+        help="A Keras model to use. (default: an untrained model)",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        "-b",
+        default=DEFAULT_BATCH_SIZES,
+        type=list_arg(type=int),
+        help="A comma-separated list of batch sizes. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--min-time",
+        default=DEFAULT_MIN_TIME,
+        type=float,
+        help="Seconds to spend timing each engine at each batch size. "
+        "(default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if args.model_in is not None:
+        import keras
+
+        model = keras.models.load_model(args.model_in)
+    else:
+        from ncaa_predict.models import build_model
+
+        model = build_model()
+        model.build([None, 2, N_PLAYERS, N_FEATURES])
+    exported = numpy_model.from_keras(model)
+
+    rng = np.random.default_rng(0)
+    engines = [
+        ("keras predict", lambda x: model.predict(x, batch_size=len(x), verbose=0)),
+        ("keras predict_on_batch", model.predict_on_batch),
+        ("numpy", exported.predict),
+    ]
+    print("batch  engine                   ms/call   games/s  speedup")
+    for batch_size in args.batch_sizes:
+        x = rng.normal(size=[batch_size, 2, N_PLAYERS, N_FEATURES]).astype(np.float32)
+        baseline = None
+        for name, predict in engines:
+            seconds = time_calls(lambda: predict(x), args.min_time)
+            if baseline is None:
+                baseline = seconds
+            print(
+                "%5d  %-22s  %9.3f  %8.0f  %6.1fx"
+                % (
+                    batch_size,
+                    name,
+                    seconds * 1000,
+                    batch_size / seconds,
+                    baseline / seconds,
+                )
+            )
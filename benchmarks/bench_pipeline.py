@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# Times each stage of the data and prediction pipeline against synthetic data
+# (or an existing data directory) and saves the results as JSON, so runs before
+# and after a change can be compared with --compare. Runs offline; the model is
+# an untrained one with the same architecture as train.py unless --model-in is
+# given.
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from ncaa_predict.util import list_arg
+import synthetic_data
+
+
+DEFAULT_REPEAT = 5
+DEFAULT_MATCHUPS = 100000
+DEFAULT_SIMULATIONS = 100000
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+N_BRACKET_TEAMS = 64
+
+
+def data_years(data_dir):
+    paths = glob.glob(os.path.join(data_dir, "csv", "ncaa_games_*.csv"))
+    return sorted(
+        int(re.search(r"ncaa_games_(\d+)\.csv$", path).group(1)) for path in paths
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_bracket(names):
+    games = list(names)
+    while len(games) > 1:
+        games = [tuple(games[i : i + 2]) for i in range(0, len(games), 2)]
+    return games[0]
+
+
+# Returns a list of (name, setup, func). setup (if any) runs before each call to
+# func and isn't timed. NCAA_PREDICT_DATA_DIR and NCAA_PREDICT_CACHE_DIR need
+# to be set before the benchmarks run (the loaders read them on each call).
+def pipeline_benchmarks(years, model_in, n_matchups, n_simulations):
+    import numpy as np
+
+    from ncaa_predict import cache
+    from ncaa_predict.bracket import predict_bracket
+    from ncaa_predict.data_loader import (
+        games_csv,
+        load_csv,
+        load_data,
+        load_data_multiyear,
+        load_ncaa_games,
+        load_ncaa_players,
+        load_ncaa_schools,
+        load_teams,
+    )
+    from ncaa_predict.matchups import model_win_probability
+    from ncaa_predict.simulate import simulate_bracket
+    from ncaa_predict.util import build_school_index
+    from predict_score import get_historical_score
+
+    year = years[-1]
+
+    def purge_cache():
+        cache.purge(cache.list_entries())
+
+    games = load_ncaa_games(year)
+    team_ids, teams = load_teams(year)
+    schools = load_ncaa_schools().set_index("school_id")["school_name"]
+    school_index = build_school_index(load_ncaa_schools())
+    n_bracket = min(N_BRACKET_TEAMS, 2 ** int(np.log2(len(team_ids))))
+    bracket_ids = team_ids[:n_bracket]
+    bracket = make_bracket(schools.loc[bracket_ids].values)
+
+    if model_in is not None:
+        from ncaa_predict.models import load_model
+
+        model = load_model(model_in)
+    else:
+        from ncaa_predict.models import build_model
+
+        model = build_model()
+    win_probability = model_win_probability(model, team_ids, teams)
+    rng = np.random.default_rng(0)
+    a_ids = rng.choice(team_ids, size=n_matchups)
+    b_ids = rng.choice(team_ids, size=n_matchups)
+
+    def historical_scores():
+        for school_id in bracket_ids:
+            get_historical_score(school_id, games)
+
+    return [
+        ("load_csv", None, lambda: load_csv(games_csv(year))),
+        ("load_ncaa_players", None, lambda: load_ncaa_players(year)),
+        ("load_data", purge_cache, lambda: load_data(year)),
+        ("load_data_cached", lambda: load_data(year), lambda: load_data(year)),
+        ("load_data_multiyear", purge_cache, lambda: load_data_multiyear(years)),
+        ("get_historical_score", None, historical_scores),
+        (
+            "predict_bracket",
+            None,
+            lambda: predict_bracket(win_probability, school_index, bracket),
+        ),
+        ("model_inference", None, lambda: win_probability(a_ids, b_ids)),
+        (
+            "simulate_bracket",
+            None,
+            lambda: simulate_bracket(
+                win_probability, school_index, bracket, n_simulations, seed=0
+            ),
+        ),
+    ]
+
+
+# Runs func once to warm up, then returns the times of `repeat` more runs
+def time_runs(setup, func, repeat):
+    times = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        # The loaders print progress, which would drown out the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        if i > 0:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def print_results(results, previous=None):
+    if previous is None:
+        print("benchmark              best(ms)   mean(ms)")
+    else:
+        print("benchmark              best(ms)   mean(ms)   before(ms)  change")
+    for name, result in results.items():
+        line = "%-20s  %9.1f  %9.1f" % (
+            name,
+            result["best"] * 1000,
+            result["mean"] * 1000,
+        )
+        if previous is not None and name in previous:
+            before = previous[name]["best"]
+            line += "  %11.1f  %+5.0f%%" % (
+                before * 1000,
+                (result["best"] / before - 1) * 100,
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Benchmark against the CSVs already in DATA_DIR/csv/ (use . for "
+        "the real data) instead of generating synthetic data.",
+    )
+    parser.add_argument(
+        "--teams",
+        default=synthetic_data.DEFAULT_TEAMS,
+        type=int,
+        help="(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--games",
+        default=synthetic_data.DEFAULT_GAMES,
+        type=int,
+        help="Games per team per season. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--players",
+        default=synthetic_data.DEFAULT_PLAYERS,
+        type=int,
+        help="Players per team. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seasons",
+        default=synthetic_data.DEFAULT_SEASONS,
+        type=int,
+        help="(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--matchups",
+        default=DEFAULT_MATCHUPS,
+        type=int,
+        help="Number of games to predict in the model_inference benchmark. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--simulations",
+        default=DEFAULT_SIMULATIONS,
+        type=int,
+        help="Number of tournaments to simulate in the simulate_bracket "
+        "benchmark. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--model-in",
+        "-m",
+        default=None,
+        help="A trained model to use. (default: an untrained model)",
+    )
+    parser.add_argument(
+        "--only",
+        default=None,
+        type=list_arg(),
+        help="A comma-separated list of benchmarks to run. (default: all)",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-r",
+        default=DEFAULT_REPEAT,
+        type=int,
+        help="Number of timed runs of each benchmark. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--out",
+        "-o",
+        default=None,
+        help="File to save the results to. (default: a new file in %s)"
+        % DEFAULT_RESULTS_DIR,
+    )
+    parser.add_argument(
+        "--compare",
+        "-c",
+        default=None,
+        help="A results file from an earlier run to compare against.",
+    )
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ncaa_predict_bench_")
+    try:
+        if args.data_dir is None:
+            data_dir = os.path.join(work_dir, "data")
+            synthetic_data.generate(
+                data_dir, args.teams, args.games, args.players, args.seasons
+            )
+            scale = {
+                "teams": args.teams,
+                "games": args.games,
+                "players": args.players,
+                "seasons": args.seasons,
+            }
+        else:
+            data_dir = os.path.abspath(args.data_dir)
+            scale = {"data_dir": data_dir}
+        years = data_years(data_dir)
+        scale["years"] = years
+        scale["matchups"] = args.matchups
+        scale["simulations"] = args.simulations
+        os.environ["NCAA_PREDICT_DATA_DIR"] = data_dir
+        # Use an empty cache so results don't depend on what was cached before
+        os.environ["NCAA_PREDICT_CACHE_DIR"] = os.path.join(work_dir, "cache")
+
+        results = {}
+        for name, setup, func in pipeline_benchmarks(
+            years, args.model_in, args.matchups, args.simulations
+        ):
+            if args.only is not None and name not in args.only:
+                continue
+            times = time_runs(setup, func, args.repeat)
+            results[name] = {
+                "best": min(times),
+                "mean": sum(times) / len(times),
+                "times": times,
+            }
+    finally:
+        shutil.rmtree(work_dir)
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+    print_results(results, previous)
+
+    out = args.out
+    if out is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        out = os.path.join(
+            DEFAULT_RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S.json", time.gmtime())
+        )
+    with open(out, "w") as f:
+        json.dump(
+            {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "scale": scale,
+                "repeat": args.repeat,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print("Saved results to %s" % out)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Compares the columnar player preprocessing in ncaa_predict.data_loader
+# against the original per-row Enum implementation, which is kept here as a
+# reference. CSV parsing is shared and not included in the timings.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ncaa_predict.data_loader import (
+    CLASS_NAMES,
+    N_PLAYERS,
+    PLAYER_FEATURE_COLUMNS,
+    PLAYER_FLOAT_COLUMNS,
+    POSITION_NAMES,
+    Position,
+    build_teams,
+    load_csv,
+    players_csv,
+    prepare_players,
+)
+from ncaa_predict.util import list_arg
+
+
+def _legacy_position(col):
+    if col is np.nan:
+        return Position.NONE
+    return POSITION_NAMES[col]
+
+
+def legacy_teams(players):
+    columns = PLAYER_FEATURE_COLUMNS + ["school_id"]
+    players.loc[players["height"] < 48, "height"] = 75
+    players = players.fillna({"height": 75})
+    players["position"] = players["position"].apply(_legacy_position)
+    players["class"] = players["class"].apply(CLASS_NAMES.__getitem__)
+    for colprefix in ["fg", "3pt", "freethrows"]:
+        players[colprefix + "_rate"] = (
+            players[colprefix + "_made"] / players[colprefix + "_attempts"]
+        ).replace([np.nan, np.inf, -np.inf], 0)
+    for colprefix in ["rebounds", "assists", "blocks", "steals", "points"]:
+        players[colprefix + "_avg"] = (
+            players[colprefix + "_num"] / players["g"]
+        ).replace([np.nan, np.inf, -np.inf], 0)
+    players = players[columns].fillna(0)
+    players = players.sort_values("g", ascending=False, kind="mergesort")
+    players = players.groupby("school_id")
+
+    school_ids = []
+    teams = []
+    for school_id, team in players:
+        team = np.hstack(
+            [
+                team[PLAYER_FLOAT_COLUMNS].values,
+                [p.value for p in team["position"].values],
+                [c.value for c in team["class"].values],
+            ]
+        )
+        if len(team) >= N_PLAYERS:
+            school_ids.append(school_id)
+            teams.append(team[:N_PLAYERS])
+    return np.array(school_ids), np.array(teams, dtype=np.float32)
+
+
+def columnar_teams(players):
+    return build_teams(prepare_players(players))
+
+
+def best_time(func, raw, repeat):
+    times = []
+    for _ in range(repeat):
+        players = raw.copy()
+        start = time.perf_counter()
+        result = func(players)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--years",
+        "-y",
+        default=list(range(2002, 2018)),
+        type=list_arg(type=int),
+        help="A comma-separated list of years. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-r",
+        default=3,
+        type=int,
+        help="Number of runs to take the best time from. (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    print("year  legacy(ms)  columnar(ms)  speedup  identical")
+    for year in args.years:
+        raw = load_csv(players_csv(year))
+        legacy_time, (legacy_ids, legacy) = best_time(legacy_teams, raw, args.repeat)
+        columnar_time, (ids, teams) = best_time(columnar_teams, raw, args.repeat)
+        identical = np.array_equal(legacy_ids, ids) and np.array_equal(legacy, teams)
+        print(
+            "%s  %10.1f  %12.1f  %6.1fx  %s"
+            % (
+                year,
+                legacy_time * 1000,
+                columnar_time * 1000,
+                legacy_time / columnar_time,
+                identical,
+            )
+        )
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Times how long ncaa-predict.py takes to start each command (with --help, so
+# only imports and argument parsing are measured), and checks that commands
+# which don't need a model stay under a startup budget and never import
+# TensorFlow. Exits with an error if any command is over budget.
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLI = os.path.join(ROOT, "ncaa-predict.py")
+
+DEFAULT_BUDGET = 1.0
+# Commands that should never need TensorFlow
+DATA_COMMANDS = ["fetch", "cache", "build-db", "build-parquet"]
+MODEL_COMMANDS = [
+    "train",
+    "sweep",
+    "evaluate",
+    "backtest",
+    "export-model",
+    "predict",
+    "optimize-bracket",
+    "predict-score",
+    "build-win-matrix",
+    "serve",
+]
+
+
+def best_time(argv, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            argv,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd=ROOT,
+        )
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def imports_tensorflow(command):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", CLI, command, "--help"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        cwd=ROOT,
+    )
+    modules = [line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines()]
+    return "tensorflow" in modules or "keras" in modules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--budget",
+        default=DEFAULT_BUDGET,
+        type=float,
+        help="Maximum startup time in seconds for commands that don't need a "
+        "model. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-r",
+        default=5,
+        type=int,
+        help="Number of runs to take the best time from. (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    keras_time = best_time([sys.executable, "-c", "import keras"], args.repeat)
+    print("import keras: %.2fs" % keras_time)
+    print("command           startup(s)  tensorflow  budget")
+    over_budget = []
+    for command in DATA_COMMANDS + MODEL_COMMANDS:
+        startup = best_time([sys.executable, CLI, command, "--help"], args.repeat)
+        tensorflow = imports_tensorflow(command)
+        if command in DATA_COMMANDS:
+            ok = startup <= args.budget and not tensorflow
+            budget = "ok" if ok else "OVER"
+            if not ok:
+                over_budget.append(command)
+        else:
+            budget = "-"
+        print("%-16s  %10.2f  %10s  %s" % (command, startup, tensorflow, budget))
+
+    if over_budget:
+        print("Over the %.2fs budget: %s" % (args.budget, ", ".join(over_budget)))
+        sys.exit(1)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# Writes fake schools, games and players CSVs in the same format as the ones in
+# csv/, at any scale, so the pipeline can be benchmarked offline. Point the
+# loaders at the output with NCAA_PREDICT_DATA_DIR.
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ncaa_predict.data_loader import CLASS_NAMES, POSITION_NAMES
+
+
+DEFAULT_TEAMS = 350
+DEFAULT_GAMES = 30
+DEFAULT_PLAYERS = 15
+DEFAULT_SEASONS = 3
+DEFAULT_FIRST_YEAR = 2015
+# Fraction of games against schools that aren't in the data set, which have no
+# opponent_id
+NON_DIVISION_FRACTION = 0.1
+FIRST_SCHOOL_ID = 1000
+
+GAME_COLUMNS = [
+    "opponent_name",
+    "game_date",
+    "score",
+    "opponent_score",
+    "location",
+    "neutral_site_location",
+    "game_length",
+    "attendence",
+    "opponent_id",
+    "year",
+    "school_id",
+]
+PLAYER_COLUMNS = [
+    "player_name",
+    "class",
+    "season",
+    "position",
+    "height",
+    "g",
+    "fg_made",
+    "fg_attempts",
+    "fg_percent",
+    "3pt_made",
+    "3pt_attempts",
+    "3pt_percent",
+    "freethrows_made",
+    "freethrows_attempts",
+    "freethrows_percent",
+    "rebounds_num",
+    "rebounds_avg",
+    "assists_num",
+    "assists_avg",
+    "blocks_num",
+    "blocks_avg",
+    "steals_num",
+    "steals_avg",
+    "points_num",
+    "points_avg",
+    "turnovers",
+    "dd",
+    "td",
+    "player_id",
+    "year",
+    "school_id",
+]
+
+
+def school_names(school_ids):
+    return ["Synthetic %s" % school_id for school_id in school_ids]
+
+
+def synthetic_schools(n_teams):
+    school_ids = np.arange(FIRST_SCHOOL_ID, FIRST_SCHOOL_ID + n_teams)
+    return pd.DataFrame(
+        {"school_id": school_ids, "school_name": school_names(school_ids)}
+    )
+
+
+def synthetic_games(rng, year, school_ids, n_games):
+    n_teams = len(school_ids)
+    # Each team has a strength, so results aren't pure noise
+    strength = rng.normal(70, 6, size=n_teams)
+    n_matchups = n_teams * n_games // 2
+    a = rng.integers(0, n_teams, size=n_matchups)
+    b = (a + rng.integers(1, n_teams, size=n_matchups)) % n_teams
+    a_scores = np.round(strength[a] - strength[b] / 10 + rng.normal(7, 10, n_matchups))
+    b_scores = np.round(strength[b] - strength[a] / 10 + rng.normal(7, 10, n_matchups))
+    b_scores[a_scores == b_scores] += 1
+    # Every game between two schools in the data set is listed by both of them
+    school = np.concatenate([school_ids[a], school_ids[b]])
+    opponent = np.concatenate([school_ids[b], school_ids[a]]).astype(float)
+    scores = np.concatenate([a_scores, b_scores])
+    opponent_scores = np.concatenate([b_scores, a_scores])
+    locations = np.concatenate(
+        [
+            rng.choice(["Home", "Away", "Neutral"], size=n_matchups),
+            rng.choice(["Home", "Away", "Neutral"], size=n_matchups),
+        ]
+    )
+    opponent_names = np.array(school_names(opponent.astype(np.int64)), dtype=object)
+    non_division = rng.random(len(school)) < NON_DIVISION_FRACTION
+    opponent[non_division] = np.nan
+    opponent_names[non_division] = "Non-Division School"
+    # Both listings of a game have the same date, like the real data
+    days = np.tile(rng.integers(0, 120, size=n_matchups), 2)
+    dates = pd.Timestamp("%s-11-10" % (year - 1)) + pd.to_timedelta(days, unit="D")
+    games = pd.DataFrame(
+        {
+            "opponent_name": opponent_names,
+            "game_date": dates.strftime("%m/%d/%Y"),
+            "score": scores.astype(np.int64),
+            "opponent_score": opponent_scores.astype(np.int64),
+            "location": locations,
+            "neutral_site_location": "",
+            "game_length": "",
+            "attendence": rng.integers(500, 20000, size=len(school)),
+            "opponent_id": pd.array(opponent, dtype="Int64"),
+            "year": year,
+            "school_id": school,
+        }
+    )
+    return games.sort_values("school_id", kind="mergesort")[GAME_COLUMNS]
+
+
+def synthetic_players(rng, year, school_ids, n_players, n_games):
+    n = len(school_ids) * n_players
+    g = rng.integers(0, n_games + 1, size=n)
+    played = g > 0
+
+    def counting(per_game):
+        return np.where(played, rng.poisson(per_game * np.maximum(g, 1)), np.nan)
+
+    fg_attempts = counting(rng.uniform(1, 12, size=n))
+    fg_made = np.floor(fg_attempts * rng.uniform(0.3, 0.6, size=n))
+    three_attempts = counting(rng.uniform(0, 5, size=n))
+    three_made = np.floor(three_attempts * rng.uniform(0.2, 0.45, size=n))
+    ft_attempts = counting(rng.uniform(0, 5, size=n))
+    ft_made = np.floor(ft_attempts * rng.uniform(0.5, 0.9, size=n))
+    points = 2 * fg_made + three_made + ft_made
+
+    def percent(made, attempts):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.round(made / attempts, 3)
+
+    def average(total):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.round(total / g, 3)
+
+    rebounds = counting(rng.uniform(0, 8, size=n))
+    assists = counting(rng.uniform(0, 4, size=n))
+    blocks = counting(rng.uniform(0, 1.5, size=n))
+    steals = counting(rng.uniform(0, 1.5, size=n))
+    positions = rng.choice(list(POSITION_NAMES) + [""], size=n)
+    height = rng.normal(77, 3, size=n).round()
+    # The real data has some missing and nonsense heights
+    height[rng.random(n) < 0.02] = np.nan
+    height[rng.random(n) < 0.01] = 0
+    players = pd.DataFrame(
+        {
+            "player_name": ["Player %s" % i for i in range(n)],
+            "class": rng.choice(list(CLASS_NAMES), size=n),
+            "season": "%s-%02d" % (year - 1, year % 100),
+            "position": positions,
+            "height": pd.array(height, dtype="Int64"),
+            "g": np.where(played, g, np.nan),
+            "fg_made": fg_made,
+            "fg_attempts": fg_attempts,
+            "fg_percent": percent(fg_made, fg_attempts),
+            "3pt_made": three_made,
+            "3pt_attempts": three_attempts,
+            "3pt_percent": percent(three_made, three_attempts),
+            "freethrows_made": ft_made,
+            "freethrows_attempts": ft_attempts,
+            "freethrows_percent": percent(ft_made, ft_attempts),
+            "rebounds_num": rebounds,
+            "rebounds_avg": average(rebounds),
+            "assists_num": assists,
+            "assists_avg": average(assists),
+            "blocks_num": blocks,
+            "blocks_avg": average(blocks),
+            "steals_num": steals,
+            "steals_avg": average(steals),
+            "points_num": points,
+            "points_avg": average(points),
+            "turnovers": counting(rng.uniform(0, 3, size=n)),
+            "dd": counting(0.05),
+            "td": counting(0.001),
+            "player_id": np.arange(n) + year * 100000,
+            "year": year,
+            "school_id": np.repeat(school_ids, n_players),
+        }
+    )
+    return players[PLAYER_COLUMNS]
+
+
+def generate(
+    directory,
+    n_teams=DEFAULT_TEAMS,
+    n_games=DEFAULT_GAMES,
+    n_players=DEFAULT_PLAYERS,
+    seasons=DEFAULT_SEASONS,
+    first_year=DEFAULT_FIRST_YEAR,
+    seed=0,
+):
+    rng = np.random.default_rng(seed)
+    csv_dir = os.path.join(directory, "csv")
+    os.makedirs(csv_dir, exist_ok=True)
+    schools = synthetic_schools(n_teams)
+    schools.to_csv(os.path.join(csv_dir, "ncaa_schools.csv"), index=False)
+    school_ids = schools["school_id"].values
+    years = list(range(first_year, first_year + seasons))
+    for year in years:
+        games = synthetic_games(rng, year, school_ids, n_games)
+        games.to_csv(os.path.join(csv_dir, "ncaa_games_%s.csv" % year), index=False)
+        players = synthetic_players(rng, year, school_ids, n_players, n_games)
+        players.to_csv(
+            os.path.join(csv_dir, "ncaa_players_%s.csv" % year), index=False
+        )
+    return years
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write synthetic NCAA CSVs for benchmarking."
+    )
+    parser.add_argument("out_dir", help="The CSVs are written to OUT_DIR/csv/.")
+    parser.add_argument(
+        "--teams", default=DEFAULT_TEAMS, type=int, help="(default: %(default)s)"
+    )
+    parser.add_argument(
+        "--games",
+        default=DEFAULT_GAMES,
+        type=int,
+        help="Games per team per season. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--players",
+        default=DEFAULT_PLAYERS,
+        type=int,
+        help="Players per team. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seasons", default=DEFAULT_SEASONS, type=int, help="(default: %(default)s)"
+    )
+    parser.add_argument(
+        "--first-year",
+        default=DEFAULT_FIRST_YEAR,
+        type=int,
+        help="(default: %(default)s)",
+    )
+    parser.add_argument("--seed", default=0, type=int, help="(default: %(default)s)")
+    args = parser.parse_args()
+
+    years = generate(
+        args.out_dir,
+        args.teams,
+        args.games,
+        args.players,
+        args.seasons,
+        args.first_year,
+        args.seed,
+    )
+    print("Wrote %s teams for %s to %s" % (args.teams, years, args.out_dir))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import argparse
+
+from ncaa_predict.sqlite_loader import DEFAULT_DB, import_csvs
+from ncaa_predict.util import list_arg
+
+
+DESCRIPTION = (
+    "Import the CSVs into an indexed SQLite database, which can be used "
+    "instead of the CSVs with --db."
+)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_DB,
+        help="The database file to create or update. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--years",
+        "-y",
+        default=list(range(2002, 2018)),
+        type=list_arg(type=int),
+        help="A comma-separated list of years to import. Years that were "
+        "already imported are replaced. (default: %(default)s)",
+    )
+
+
+def main(args):
+    import_csvs(args.years, args.db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
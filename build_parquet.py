@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import argparse
+
+from ncaa_predict.parquet_loader import DEFAULT_DIR, convert_csvs
+from ncaa_predict.util import list_arg
+
+
+DESCRIPTION = (
+    "Convert the CSVs to compressed Parquet files with a fixed schema, for use "
+    "with ncaa_predict.parquet_loader."
+)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--out-dir",
+        "-o",
+        default=DEFAULT_DIR,
+        help="The directory to write to. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--years",
+        "-y",
+        default=list(range(2002, 2018)),
+        type=list_arg(type=int),
+        help="A comma-separated list of years to convert. (default: %(default)s)",
+    )
+
+
+def main(args):
+    convert_csvs(args.years, args.out_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import argparse
+
+from ncaa_predict.bracket import bracket_teams
+from ncaa_predict.data_loader import load_ncaa_schools, load_teams, team_rows
+from ncaa_predict.matchups import DEFAULT_BATCH_SIZE, build_win_matrix, save_win_matrix
+from ncaa_predict.models import load_model
+from ncaa_predict.util import build_school_index, team_names_to_ids
+from predict import BRACKET
+
+
+DESCRIPTION = (
+    "Precompute the probability of every team beating every other team in a "
+    "year, so ./predict.py --win-matrix can look them up instead of running "
+    "the model."
+)
+
+
+def add_arguments(parser):
+    parser.add_argument("--model-in", "-m", required=True)
+    parser.add_argument("--year", "-y", default=2017, type=int)
+    parser.add_argument(
+        "--out",
+        "-o",
+        required=True,
+        help="File to save the matrix to (.npz).",
+    )
+    parser.add_argument(
+        "--bracket",
+        default=False,
+        action="store_const",
+        const=True,
+        help="Only include the teams in the bracket in predict.py. (default: "
+        "every team with player data)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help="The number of matchups to predict at once. (default: %(default)s)",
+    )
+
+
+def main(args):
+    team_ids, teams = load_teams(args.year)
+    if args.bracket:
+        school_index = build_school_index(load_ncaa_schools())
+        field = sorted(set(team_names_to_ids(bracket_teams(BRACKET), school_index)))
+        rows = team_rows(team_ids, field)
+        if (rows < 0).any():
+            raise Exception(
+                "Couldn't find players for school ID [%s]"
+                % field[list(rows).index(-1)]
+            )
+        team_ids, teams = team_ids[rows], teams[rows]
+
+    model = load_model(args.model_in)
+    probs = build_win_matrix(model, teams, args.batch_size)
+    save_win_matrix(args.out, team_ids, probs)
+    print("Saved %s x %s win probabilities to %s" % (len(teams), len(teams), args.out))
+
+    # Workaround for TensorFlow bug:
+    # https://github.com/tensorflow/tensorflow/issues/3388
+    import gc
+
+    gc.collect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -1,22 +1,61 @@
 #!/usr/bin/env python3
 import argparse
 
-import keras
+from ncaa_predict import metrics, profiling
+from ncaa_predict.backtest import DEFAULT_BATCH_SIZE, predict_year
+from ncaa_predict.ensemble import load_models
+from ncaa_predict.util import list_arg
 
-from ncaa_predict.data_loader import load_data
 
+DESCRIPTION = "Evaluate a trained model against one year's games."
 
-def evaluate(model, year):
-    features, labels = load_data(year)
+
+def evaluate(model, year, batch_size=DEFAULT_BATCH_SIZE):
     print("\nEvaluating accuracy")
-    model.evaluate(x=features, y=labels, verbose=1)
+    with profiling.stage("evaluate"):
+        labels, probs = predict_year(model, year, batch_size)
+        score = metrics.score(labels, probs)
+    print(
+        "%s games: accuracy %.4f, AUC %.4f, log loss %.4f"
+        % (score["games"], score["accuracy"], score["auc"], score["log_loss"])
+    )
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--model-in", "-m", required=True)
+def add_arguments(parser):
+    parser.add_argument(
+        "--model-in",
+        "-m",
+        required=True,
+        action="append",
+        help="A Keras model, or one exported by ./export_model.py. Repeat to "
+        "evaluate the average of several models' predictions.",
+    )
+    parser.add_argument(
+        "--weights",
+        default=None,
+        type=list_arg(float),
+        help="Comma-separated weights for averaging the --model-in models' "
+        "predictions, in the same order. (default: equal weights)",
+    )
     parser.add_argument("--year", "-y", default=2016, type=int)
-    args = parser.parse_args()
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help="The number of games to evaluate at once. (default: %(default)s)",
+    )
+    profiling.add_argument(parser)
+
 
-    model = keras.models.load_model(args.model_in)
-    evaluate(model, args.year)
+def main(args):
+    with profiling.profile(args.profile):
+        with profiling.stage("load_model"):
+            model = load_models(args.model_in, args.weights)
+        evaluate(model, args.year, args.batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
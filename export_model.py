@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import argparse
+import os
+
+import numpy as np
+
+from ncaa_predict import numpy_model
+from ncaa_predict.data_loader import game_features, load_game_table
+
+
+DESCRIPTION = (
+    "Export a Keras model's weights so it can be run with NumPy instead of "
+    "TensorFlow, and check that it makes the same predictions."
+)
+
+DEFAULT_CHECK_GAMES = 1000
+# Differences allowed from Keras' predictions, as in np.allclose(). The two
+# multiply in different orders, so float32 rounding differs a little.
+DEFAULT_RTOL = 1e-4
+DEFAULT_ATOL = 1e-6
+
+
+def add_arguments(parser):
+    parser.add_argument("--model-in", "-m", required=True)
+    parser.add_argument(
+        "--out",
+        "-o",
+        required=True,
+        help="File to save the exported model to (%s). Any command that takes "
+        "--model-in can load it." % numpy_model.SUFFIX,
+    )
+    parser.add_argument(
+        "--year",
+        "-y",
+        default=None,
+        type=int,
+        help="Check the predictions on this year's games. (default: check them "
+        "on random inputs)",
+    )
+    parser.add_argument(
+        "--check-games",
+        default=DEFAULT_CHECK_GAMES,
+        type=int,
+        help="The number of games to check. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rtol",
+        default=DEFAULT_RTOL,
+        type=float,
+        help="The largest difference from Keras' predictions allowed, relative "
+        "to Keras' prediction. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--atol",
+        default=DEFAULT_ATOL,
+        type=float,
+        help="The largest difference from Keras' predictions allowed on top of "
+        "--rtol. (default: %(default)s)",
+    )
+
+
+def main(args):
+    import keras
+
+    if not args.out.endswith(numpy_model.SUFFIX):
+        raise Exception("Exported models need to end with %s" % numpy_model.SUFFIX)
+    model = keras.models.load_model(args.model_in)
+    # Only move the model to args.out once it passes the check, so a failed
+    # export doesn't leave a model behind
+    tmp_path = "%s.tmp-%s%s" % (
+        args.out[: -len(numpy_model.SUFFIX)],
+        os.getpid(),
+        numpy_model.SUFFIX,
+    )
+    numpy_model.from_keras(model).save(tmp_path)
+
+    rng = np.random.default_rng(0)
+    if args.year is None:
+        x = rng.normal(size=[args.check_games] + list(model.input_shape[1:]))
+        x = x.astype(np.float32)
+    else:
+        teams, games = load_game_table(args.year)
+        rows = rng.choice(len(games), min(args.check_games, len(games)), replace=False)
+        x = game_features(teams, games[np.sort(rows)])
+    expected = model.predict(x, batch_size=len(x), verbose=0)
+    # Check the saved file rather than the weights still in memory
+    actual = numpy_model.load(tmp_path).predict(x)
+    difference = float(np.abs(actual - expected).max())
+    print("Max difference from Keras on %s games: %.3g" % (len(x), difference))
+    if not np.allclose(actual, expected, rtol=args.rtol, atol=args.atol):
+        os.remove(tmp_path)
+        raise Exception(
+            "Exported model differs from Keras by %.3g (more than rtol=%.3g, "
+            "atol=%.3g allow)" % (difference, args.rtol, args.atol)
+        )
+    os.replace(tmp_path, args.out)
+    print("Saved model to %s" % args.out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -1,18 +1,34 @@
 #!/usr/bin/env python3
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import csv
-import itertools
-import multiprocessing
+import functools
+import hashlib
+import json
 import os
+import threading
+import time
 
 import lxml.html
 import requests
 
 
-SEARCH_URL = "http://web1.ncaa.org/stats/StatsSrv/careersearch"
-RECORDS_URL = "http://web1.ncaa.org/stats/exec/records"
-TEAM_URL = "http://web1.ncaa.org/stats/StatsSrv/careerteam"
+DESCRIPTION = "Download game, player and school data from the NCAA stats site."
+
+DEFAULT_BASE_URL = "http://web1.ncaa.org"
+SEARCH_PATH = "/stats/StatsSrv/careersearch"
+RECORDS_PATH = "/stats/exec/records"
+TEAM_PATH = "/stats/StatsSrv/careerteam"
 SCHOOL_CSV = "csv/ncaa_schools.csv"
+MANIFEST_JSON = "csv/manifest.json"
+
+# NCAA will temporarily block us if we make too many requests at once, so
+# these are conservative
+DEFAULT_JOBS = 1
+DEFAULT_RATE_LIMIT = 1.0
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 2.0
+TIMEOUT = 60
 
 SCRAPE_GAME_COLS = [
     "opponent_name",
@@ -69,18 +85,245 @@ PLAYER_COLS = SCRAPE_PLAYER_COLS + [
 ]
 
 
-def post_form(url, post_data=None):
-    headers = {
-        "user-agent": "Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, "
-        "like Gecko) Chrome/41.0.2228.0 Safari/537.36",
-        "referrer": url,
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        time.sleep(start - now)
+
+
+# Shares one keep-alive session between up to `jobs` threads, spacing requests
+# out to `rate_limit` per second and retrying failures with exponential backoff
+class Client:
+    def __init__(
+        self,
+        base_url=DEFAULT_BASE_URL,
+        jobs=DEFAULT_JOBS,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.jobs = jobs
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=jobs)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post_form(self, path, post_data=None):
+        url = self.base_url + path
+        headers = {
+            "user-agent": "Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, "
+            "like Gecko) Chrome/41.0.2228.0 Safari/537.36",
+            "referrer": url,
+        }
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                if post_data is not None:
+                    res = self.session.post(
+                        url, data=post_data, headers=headers, timeout=TIMEOUT
+                    )
+                else:
+                    res = self.session.get(url, headers=headers, timeout=TIMEOUT)
+                res.raise_for_status()
+                return lxml.html.document_fromstring(res.text)
+            except requests.exceptions.RequestException as e:
+                # Retry connection problems, rate limiting and server errors
+                response = getattr(e, "response", None)
+                retryable = response is None or (
+                    response.status_code == 429 or response.status_code >= 500
+                )
+                if not retryable or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                print("Retrying %s in %.0fs (%s)" % (url, delay, e))
+                time.sleep(delay)
+
+    # Runs func(year, school) for each school on `jobs` threads, returning
+    # the results in the same order and the schools that failed
+    def map_schools(self, func, year, schools):
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(func, self, year, school) for school in schools]
+        results = []
+        failed = []
+        for school, future in zip(schools, futures):
+            try:
+                results.append(future.result())
+            except requests.exceptions.RequestException as e:
+                print("Failed to load %s/%s: %s" % (year, school["school_name"], e))
+                failed.append(school)
+        return results, failed
+
+
+def report_failures(command_name, year, failed):
+    if not failed:
+        return
+    print("Failed to load %s schools for %s:" % (len(failed), year))
+    for school in failed:
+        print("    %s (%s)" % (school["school_name"], school["school_id"]))
+    print(
+        "Run ./fetch_csvs.py %s -y %s --only-failed to retry just these schools"
+        % (command_name, year)
+    )
+
+
+# The manifest records when each per-school CSV was fetched, its checksum and
+# whether the last attempt to fetch it failed, plus the checksums of the
+# per-school files each per-year CSV was built from
+def load_manifest():
+    try:
+        with open(MANIFEST_JSON) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}, "aggregates": {}}
+
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_JSON), exist_ok=True)
+    tmp_path = MANIFEST_JSON + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_JSON)
+
+
+def file_sha1(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _fetched_entry(path, fetched):
+    return {"fetched": fetched, "sha1": file_sha1(path), "status": "ok"}
+
+
+# Marks a school in a per-year CSV's manifest entry whose rows came from the
+# per-year CSV itself (like the published ones in csv/) instead of from a
+# per-school file
+FROM_AGGREGATE = "aggregate"
+
+
+# Fetches the per-school CSVs for a year that are missing, older than max_age
+# seconds, (with only_failed) failed last time or (with refresh) all of them,
+# then updates the per-year CSV at `path` by replacing only the rows for
+# schools whose files changed. A per-year CSV that isn't in the manifest is
+# taken to be up to date, so schools it covers aren't fetched unless they're
+# older than max_age (by the CSV's mtime) or refresh is set.
+def update_year(
+    client,
+    command_name,
+    year,
+    schools,
+    fetch_school,
+    school_path,
+    path,
+    colnames,
+    manifest,
+    max_age=None,
+    only_failed=False,
+    refresh=False,
+):
+    files = manifest["files"]
+    now = time.time()
+    if path not in manifest["aggregates"] and os.path.exists(path):
+        # Built before we had a manifest (or downloaded), so assume it covers
+        # every school and was built from any per-school files we have
+        built_from = {school["school_id"]: FROM_AGGREGATE for school in schools}
+        built_from.update((row["school_id"], FROM_AGGREGATE) for row in read_csv(path))
+        for school_id in built_from:
+            file_path = school_path(year, school_id)
+            if os.path.exists(file_path):
+                built_from[school_id] = file_sha1(file_path)
+        manifest["aggregates"][path] = built_from
+    built_from = manifest["aggregates"].get(path, {})
+    from_aggregate = {
+        school_id for school_id, sha1 in built_from.items() if sha1 == FROM_AGGREGATE
     }
-    if post_data is not None:
-        res = requests.post(url, data=post_data, headers=headers)
-    else:
-        res = requests.get(url, headers=headers)
-    res.raise_for_status()
-    return lxml.html.document_fromstring(res.text)
+    to_fetch = []
+    for school in schools:
+        file_path = school_path(year, school["school_id"])
+        entry = files.get(file_path)
+        exists = os.path.exists(file_path)
+        if exists and entry is None:
+            # Fetched before we had a manifest
+            entry = files[file_path] = _fetched_entry(
+                file_path, os.path.getmtime(file_path)
+            )
+        if refresh:
+            fetch = True
+        elif only_failed:
+            fetch = entry is not None and entry["status"] == "failed"
+        elif exists:
+            fetch = max_age is not None and now - entry["fetched"] > max_age
+        elif school["school_id"] in from_aggregate:
+            fetch = max_age is not None and now - os.path.getmtime(path) > max_age
+        else:
+            fetch = True
+        if fetch:
+            to_fetch.append(school)
+
+    _, failed = client.map_schools(
+        functools.partial(fetch_school, refresh=True), year, to_fetch
+    )
+    failed_ids = {school["school_id"] for school in failed}
+    for school in to_fetch:
+        file_path = school_path(year, school["school_id"])
+        if school["school_id"] in failed_ids:
+            entry = files.setdefault(file_path, {})
+            entry.update({"status": "failed", "failed": now})
+        else:
+            files[file_path] = _fetched_entry(file_path, now)
+
+    current = {}
+    for school in schools:
+        file_path = school_path(year, school["school_id"])
+        if os.path.exists(file_path):
+            # Hash the file again in case it was edited by hand
+            files[file_path]["sha1"] = file_sha1(file_path)
+            current[school["school_id"]] = files[file_path]["sha1"]
+    # Keep the rows of schools that only have them in the per-year CSV
+    for school_id in from_aggregate - set(current):
+        current[school_id] = FROM_AGGREGATE
+    changed = {
+        school_id
+        for school_id in set(current) | set(built_from)
+        if current.get(school_id) != built_from.get(school_id)
+    }
+    # Schools that failed without any earlier data would leave holes in the
+    # per-year CSV, so leave it alone until they load
+    missing = [school for school in failed if school["school_id"] not in current]
+    if missing:
+        print("Not updating %s until every school has loaded" % path)
+    elif changed or (current and not os.path.exists(path)):
+        print("Updating %s for %s changed schools" % (path, len(changed)))
+        rows_by_school = {}
+        if os.path.exists(path):
+            for row in read_csv(path):
+                rows_by_school.setdefault(row["school_id"], []).append(row)
+        for school_id in changed:
+            if school_id in current:
+                rows_by_school[school_id] = read_csv(school_path(year, school_id))
+            else:
+                rows_by_school.pop(school_id, None)
+        order = [school["school_id"] for school in schools]
+        order += sorted(set(rows_by_school) - set(order))
+        write_csv(
+            path,
+            [row for school_id in order for row in rows_by_school.get(school_id, [])],
+            colnames,
+        )
+        manifest["aggregates"][path] = current
+    save_manifest(manifest)
+    report_failures(command_name, year, failed)
 
 
 def read_csv(csv_in):
@@ -98,16 +341,20 @@ def write_csv(csv_out, data, colnames):
             writer.writerow(row)
 
 
-def load_schools():
+def load_schools(client):
     if not os.path.exists(SCHOOL_CSV):
-        get_schools()
+        get_schools(client)
     return read_csv(SCHOOL_CSV)
 
 
-def get_school_games(year, school):
+def school_games_path(year, school_id):
+    return "csv/games/ncaa_games_%s_%s.csv" % (year, school_id)
+
+
+def get_school_games(client, year, school, refresh=False):
     print("%s/%s" % (year, school["school_name"]))
-    path = "csv/games/ncaa_games_%s_%s.csv" % (year, school["school_id"])
-    if not os.path.exists(path):
+    path = school_games_path(year, school["school_id"])
+    if refresh or not os.path.exists(path):
         int_cols = [
             "opponent_id",
             "score",
@@ -115,19 +362,14 @@ def get_school_games(year, school):
             "attendence",
             "school_id",
         ]
-        try:
-            page = post_form(
-                RECORDS_URL,
-                {
-                    "academicYear": str(year),
-                    "orgId": school["school_id"],
-                    "sportCode": "MBB",
-                },
-            )
-        except requests.exceptions.HTTPError:
-            # We can try again later
-            print("Failed to load %s/%s" % (year, school["school_name"]))
-            return []
+        page = client.post_form(
+            RECORDS_PATH,
+            {
+                "academicYear": str(year),
+                "orgId": school["school_id"],
+                "sportCode": "MBB",
+            },
+        )
 
         rows = page.xpath("//form[@name='orgRecords']/table[2]/tr[position()>1]")
         games = []
@@ -162,41 +404,49 @@ def get_school_games(year, school):
     return read_csv(path)
 
 
-def get_games(years):
-    schools = load_schools()
+def get_games(client, years, max_age=None, only_failed=False, refresh=False):
+    schools = load_schools(client)
+    manifest = load_manifest()
     for year in years:
-        path = "csv/ncaa_games_%s.csv" % year
-        if not os.path.exists(path):
-            games = []
-            for school in schools:
-                games.extend(get_school_games(year, school))
-            write_csv(path, games, GAME_COLS)
+        update_year(
+            client,
+            "get_games",
+            year,
+            schools,
+            get_school_games,
+            school_games_path,
+            "csv/ncaa_games_%s.csv" % year,
+            GAME_COLS,
+            manifest,
+            max_age,
+            only_failed,
+            refresh,
+        )
+
+
+def school_players_path(year, school_id):
+    return "csv/players/ncaa_players_%s_%s.csv" % (year, school_id)
 
 
-def get_school_players(year, school):
+def get_school_players(client, year, school, refresh=False):
     print("%s/%s" % (year, school["school_name"]))
-    path = "csv/players/ncaa_players_%s_%s.csv" % (year, school["school_id"])
-    if not os.path.exists(path):
+    path = school_players_path(year, school["school_id"])
+    if refresh or not os.path.exists(path):
         int_cols = ["player_id", "height", "g"]
-        try:
-            page = post_form(
-                TEAM_URL,
-                {
-                    "academicYear": str(year),
-                    "orgId": school["school_id"],
-                    "sportCode": "MBB",
-                    "sortOn": "0",
-                    "doWhat": "display",
-                    "playerId": "-100",
-                    "coachId": "-100",
-                    "division": "1",
-                    "idx": "",
-                },
-            )
-        except requests.exceptions.HTTPError:
-            # We can try again later
-            print("Failed to load %s/%s" % (year, school["school_name"]))
-            return []
+        page = client.post_form(
+            TEAM_PATH,
+            {
+                "academicYear": str(year),
+                "orgId": school["school_id"],
+                "sportCode": "MBB",
+                "sortOn": "0",
+                "doWhat": "display",
+                "playerId": "-100",
+                "coachId": "-100",
+                "division": "1",
+                "idx": "",
+            },
+        )
 
         rows = page.xpath("//table[@class='statstable'][2]//tr[position()>3]")
         players = []
@@ -236,19 +486,28 @@ def get_school_players(year, school):
     return read_csv(path)
 
 
-def get_players(years):
-    schools = load_schools()
+def get_players(client, years, max_age=None, only_failed=False, refresh=False):
+    schools = load_schools(client)
+    manifest = load_manifest()
     for year in years:
-        path = "csv/ncaa_players_%s.csv" % year
-        if not os.path.exists(path):
-            players = []
-            for school in schools:
-                players.extend(get_school_players(year, school))
-            write_csv(path, players, PLAYER_COLS)
+        update_year(
+            client,
+            "get_players",
+            year,
+            schools,
+            get_school_players,
+            school_players_path,
+            "csv/ncaa_players_%s.csv" % year,
+            PLAYER_COLS,
+            manifest,
+            max_age,
+            only_failed,
+            refresh,
+        )
 
 
-def get_schools():
-    page = post_form(SEARCH_URL)
+def get_schools(client):
+    page = client.post_form(SEARCH_PATH)
     options = page.xpath("//select[@name='searchOrg']/option[position()>1]")
     schools = [
         {"school_id": option.get("value"), "school_name": option.text}
@@ -257,8 +516,35 @@ def get_schools():
     write_csv(SCHOOL_CSV, schools, colnames=list(schools[0]))
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+def add_arguments(parser):
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=DEFAULT_JOBS,
+        type=int,
+        help="Number of schools to fetch at once. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        "-r",
+        default=DEFAULT_RATE_LIMIT,
+        type=float,
+        help="Maximum requests per second, or 0 for no limit. (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--retries",
+        default=DEFAULT_RETRIES,
+        type=int,
+        help="Number of times to retry a failed request, waiting twice as "
+        "long each time. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=DEFAULT_BASE_URL,
+        help="The NCAA stats site to fetch from. Useful for testing against "
+        "a local server. (default: %(default)s)",
+    )
     subparsers = parser.add_subparsers(dest="command_name")
     subparsers.required = True
     commands = [
@@ -277,8 +563,41 @@ if __name__ == "__main__":
                 default=list(range(2002, 2018)),
                 help="The years to scrape data for. (default: %(default)s",
             )
-    args = parser.parse_args()
+            subparser.add_argument(
+                "--max-age",
+                type=lambda v: float(v) * 24 * 60 * 60,
+                default=None,
+                help="Re-fetch schools whose data is older than this many days. "
+                "(default: only fetch missing schools)",
+            )
+            subparser.add_argument(
+                "--only-failed",
+                default=False,
+                action="store_const",
+                const=True,
+                help="Only retry schools that failed to load last time.",
+            )
+            subparser.add_argument(
+                "--refresh",
+                default=False,
+                action="store_const",
+                const=True,
+                help="Re-fetch every school, even if its data is already in "
+                "the per-year CSV.",
+            )
+
+
+def main(args):
+    client = Client(args.base_url, args.jobs, args.rate_limit, args.retries)
     if args.func == get_schools:
-        args.func()
+        args.func(client)
     else:
-        args.func(args.years)
+        args.func(
+            client, args.years, args.max_age, args.only_failed, args.refresh
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from ncaa_predict import cache
+from ncaa_predict.data_loader import FEATURE_SCHEMA, load_game_table_multiyear
+from ncaa_predict.ensemble import PREDICTIONS_SCHEMA
+from ncaa_predict.ratings import RATINGS_SCHEMA, load_ratings
+from ncaa_predict.util import list_arg
+
+
+DESCRIPTION = "Manage the on-disk feature cache used by the data loaders."
+
+
+def _schema(name):
+    if name.startswith("ratings_"):
+        return RATINGS_SCHEMA
+    if name.startswith("predictions_"):
+        return PREDICTIONS_SCHEMA
+    return FEATURE_SCHEMA
+
+
+def warm(years):
+    load_game_table_multiyear(years)
+    for year in years:
+        load_ratings(year)
+
+
+def inspect(years):
+    entries = _entries_for_years(years)
+    if not entries:
+        print("Cache at %s is empty" % cache.cache_dir())
+    for name in entries:
+        meta = cache.read_meta(name)
+        state = cache.entry_state(meta, _schema(name))
+        print(
+            "%s: %s, %.1f MB, built %s"
+            % (
+                name,
+                state,
+                cache.entry_size(name) / 1e6,
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["created"])),
+            )
+        )
+        for source in meta["sources"]:
+            print("    %s (sha1 %s)" % (source["path"], source["sha1"]))
+
+
+def purge(years, stale_only=False):
+    entries = _entries_for_years(years)
+    if stale_only:
+        entries = [
+            name
+            for name in entries
+            if cache.entry_state(cache.read_meta(name), _schema(name)) == "stale"
+        ]
+    cache.purge(entries)
+    print("Removed %s cache entries" % len(entries))
+
+
+def _entries_for_years(years):
+    entries = cache.list_entries()
+    if years is None:
+        return entries
+    suffixes = tuple("_%s" % year for year in years)
+    return [name for name in entries if name.endswith(suffixes)]
+
+
+def add_arguments(parser):
+    subparsers = parser.add_subparsers(dest="command_name")
+    subparsers.required = True
+
+    warm_parser = subparsers.add_parser(
+        "warm", help="Build cached features for the given years."
+    )
+    warm_parser.set_defaults(func=warm)
+    warm_parser.add_argument(
+        "--years",
+        "-y",
+        default=list(range(2002, 2018)),
+        type=list_arg(type=int),
+        help="A comma-separated list of years. (default: %(default)s)",
+    )
+
+    for name, func, help in [
+        ("inspect", inspect, "Show cache entries and whether they are stale."),
+        ("purge", purge, "Remove cache entries."),
+    ]:
+        subparser = subparsers.add_parser(name, help=help)
+        subparser.set_defaults(func=func)
+        subparser.add_argument(
+            "--years",
+            "-y",
+            default=None,
+            type=list_arg(type=int),
+            help="A comma-separated list of years. (default: all)",
+        )
+    subparsers.choices["purge"].add_argument(
+        "--stale",
+        default=False,
+        action="store_const",
+        const=True,
+        dest="stale_only",
+        help="Only remove entries whose source CSVs or feature schema changed.",
+    )
+
+
+def main(args):
+    kwargs = vars(args)
+    func = kwargs.pop("func")
+    kwargs.pop("command_name")
+    func(**kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import sys
+
+
+# (command, script module, help). Only the module for the command being run is
+# imported, and scripts only import Keras (and so TensorFlow) once they load or
+# build a model, so data commands start quickly.
+COMMANDS = [
+    ("fetch", "fetch_csvs", "Download data from the NCAA stats site."),
+    ("cache", "manage_cache", "Warm, inspect or purge the feature cache."),
+    ("build-db", "build_db", "Import the CSVs into an SQLite database."),
+    ("build-parquet", "build_parquet", "Convert the CSVs to Parquet files."),
+    ("train", "train", "Train a model."),
+    ("sweep", "sweep", "Train models with different hyperparameters."),
+    ("evaluate", "evaluate", "Evaluate a model against one year's games."),
+    ("backtest", "backtest", "Evaluate several models over several years."),
+    ("export-model", "export_model", "Export a model to run without TensorFlow."),
+    ("predict", "predict", "Predict the winners of a bracket."),
+    ("optimize-bracket", "optimize_bracket", "Pick a bracket to win a pool."),
+    ("predict-score", "predict_score", "Predict the final score of a game."),
+    ("build-win-matrix", "build_win_matrix", "Precompute win probabilities."),
+    ("serve", "serve", "Answer matchup and bracket queries over HTTP."),
+]
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n"
+        + "\n".join("  %-18s%s" % (name, help) for name, _, help in COMMANDS)
+        + "\n\nRun '%(prog)s COMMAND --help' for a command's options.",
+    )
+    parser.add_argument(
+        "command", metavar="COMMAND", choices=[name for name, _, _ in COMMANDS]
+    )
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    module_name = dict((name, module) for name, module, _ in COMMANDS)[args.command]
+    module = importlib.import_module(module_name)
+    command_parser = argparse.ArgumentParser(
+        prog="%s %s" % (parser.prog, args.command), description=module.DESCRIPTION
+    )
+    module.add_arguments(command_parser)
+    module.main(command_parser.parse_args(args.args))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
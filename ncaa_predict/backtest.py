@@ -0,0 +1,67 @@
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from ncaa_predict import metrics
+from ncaa_predict.data_loader import count_games, game_features, load_game_table
+from ncaa_predict.models import load_model
+from ncaa_predict.util import limit_tensorflow_threads
+
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Models loaded by this worker, by path. Each worker is sent tasks for several
+# (model, year) pairs, so this saves reloading a model for every year.
+_models = {}
+
+
+def _model(path):
+    if path not in _models:
+        _models[path] = load_model(path)
+    return _models[path]
+
+
+# Returns the probability that team a won each of year's games. Models with
+# their own predict_year() (like ensemble.Ensemble, which shares each batch
+# between its members and caches their predictions) use that instead.
+def predict_year(model, year, batch_size=DEFAULT_BATCH_SIZE):
+    if hasattr(model, "predict_year"):
+        return model.predict_year(year, batch_size)
+    teams, games = load_game_table(year)
+    probs = np.empty(len(games), dtype=np.float32)
+    for start in range(0, len(games), batch_size):
+        x = game_features(teams, games[start : start + batch_size])
+        probs[start : start + len(x)] = np.asarray(model.predict_on_batch(x))[:, 0]
+    return games[:, 2], probs
+
+
+def _evaluate(task):
+    path, year, batch_size = task
+    labels, probs = predict_year(_model(path), year, batch_size)
+    result = {"model": path, "year": year}
+    result.update(metrics.score(labels, probs))
+    return result
+
+
+# Yields a metrics.score() dict (plus "model" and "year") for every pair of
+# model_paths and years, in the order they finish. Each year's game table is
+# built (or checked in the cache) once up front, then the pairs are split
+# between `jobs` worker processes, which memory-map the cached tables.
+def backtest(model_paths, years, jobs=None, batch_size=DEFAULT_BATCH_SIZE):
+    count_games(years)
+    tasks = [
+        (path, year, batch_size)
+        for path, year in itertools.product(model_paths, years)
+    ]
+    jobs = min(jobs or os.cpu_count(), len(tasks))
+    # Otherwise every worker starts a thread per core
+    threads = max(1, os.cpu_count() // jobs)
+    # TensorFlow isn't safe to fork, so workers start fresh interpreters
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        jobs, initializer=limit_tensorflow_threads, initargs=(threads,)
+    ) as p:
+        for result in p.imap_unordered(_evaluate, tasks):
+            yield result
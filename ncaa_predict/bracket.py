@@ -0,0 +1,69 @@
+from ncaa_predict.util import team_names_to_ids
+
+
+# A bracket is a tree of tuples where (a, b) means a plays b, and a or b can
+# be another tuple, in which case the winner of that game plays.
+
+
+def bracket_teams(bracket):
+    if not isinstance(bracket, tuple):
+        return [bracket]
+    return [team for side in bracket for team in bracket_teams(side)]
+
+
+# Groups the games in the bracket by round, where a game's round is one more
+# than the latest round of the games feeding into it. Games are identified by
+# their path from the root of the bracket (0 = left, 1 = right). Appends each
+# round's (path, game) pairs to rounds, and returns the bracket's own round
+# (-1 for a team).
+def games_by_round(bracket, rounds, path=()):
+    if not isinstance(bracket, tuple):
+        return -1
+    game_round = 1 + max(
+        games_by_round(side, rounds, path + (i,)) for i, side in enumerate(bracket)
+    )
+    while len(rounds) <= game_round:
+        rounds.append([])
+    rounds[game_round].append((path, bracket))
+    return game_round
+
+
+# Returns a dict mapping each game's path to (team_a, team_b, winner, p),
+# where p is the probability of the winner winning. The root game's path is ().
+def predict_bracket(win_probability, school_index, bracket):
+    names = bracket_teams(bracket)
+    school_ids = dict(zip(names, team_names_to_ids(names, school_index)))
+
+    # Every game in a round is independent, so predict each round in one batch
+    rounds = []
+    games_by_round(bracket, rounds)
+    results = {}
+    for games in rounds:
+        matchups = []
+        for path, game in games:
+            matchups.append(
+                [
+                    results[path + (i,)][2] if isinstance(side, tuple) else side
+                    for i, side in enumerate(game)
+                ]
+            )
+        a_wins = win_probability(
+            [school_ids[a] for a, _ in matchups], [school_ids[b] for _, b in matchups]
+        )
+        for (path, _), (team_a, team_b), p in zip(games, matchups, a_wins):
+            if p > 1 - p:
+                winner = team_a
+            else:
+                winner = team_b
+            results[path] = (team_a, team_b, winner, max(p, 1 - p))
+    return results
+
+
+# Yields the predict_bracket() results in bracket order, with each game after
+# the games that feed into it
+def bracket_results(bracket, results, path=()):
+    if not isinstance(bracket, tuple):
+        return
+    for i, side in enumerate(bracket):
+        yield from bracket_results(side, results, path + (i,))
+    yield results[path]
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from ncaa_predict import profiling
+
+
+THIS_DIR = os.path.dirname(__file__)
+META_FILE = "meta.json"
+
+
+# Read when it's used rather than on import, like data_loader.data_dir()
+def cache_dir():
+    return os.environ.get(
+        "NCAA_PREDICT_CACHE_DIR", os.path.join(THIS_DIR, "..", "cache")
+    )
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(path):
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha1": _sha1(path),
+    }
+
+
+def _source_state(stored):
+    # Returns "fresh", "touched" (mtime changed but contents didn't) or "stale"
+    try:
+        st = os.stat(stored["path"])
+    except FileNotFoundError:
+        return "stale"
+    if st.st_size != stored["size"]:
+        return "stale"
+    if st.st_mtime_ns == stored["mtime_ns"]:
+        return "fresh"
+    if _sha1(stored["path"]) == stored["sha1"]:
+        return "touched"
+    return "stale"
+
+
+def entry_dir(name):
+    return os.path.join(cache_dir(), name)
+
+
+def read_meta(name):
+    try:
+        with open(os.path.join(entry_dir(name), META_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+
+# If sources is given, an entry built from any other files (like the same year
+# from another NCAA_PREDICT_DATA_DIR) is stale
+def entry_state(meta, schema, sources=None):
+    if meta is None:
+        return "missing"
+    if meta["schema"] != schema:
+        return "stale"
+    if sources is not None:
+        paths = [os.path.abspath(source) for source in sources]
+        if [source["path"] for source in meta["sources"]] != paths:
+            return "stale"
+    states = [_source_state(source) for source in meta["sources"]]
+    if "stale" in states:
+        return "stale"
+    if "touched" in states:
+        return "touched"
+    return "fresh"
+
+
+def _load_arrays(name, meta):
+    path = entry_dir(name)
+    return tuple(
+        np.load(os.path.join(path, "%s.npy" % key), mmap_mode="r")
+        for key in meta["arrays"]
+    )
+
+
+def store_arrays(name, keys, arrays, sources, schema):
+    final_path = entry_dir(name)
+    tmp_path = "%s.tmp-%s" % (final_path, os.getpid())
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for key, array in zip(keys, arrays):
+        np.save(os.path.join(tmp_path, "%s.npy" % key), np.ascontiguousarray(array))
+    meta = {
+        "name": name,
+        "arrays": list(keys),
+        "schema": schema,
+        "sources": [fingerprint(source) for source in sources],
+        "created": time.time(),
+    }
+    _write_meta(tmp_path, meta)
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.rename(tmp_path, final_path)
+
+
+# Returns (state, arrays), where arrays are the ones saved under
+# cache_dir()/name if none of the source files or the schema have changed since
+# they were written (memory-mapped read-only), or None
+def lookup_arrays(name, sources, schema):
+    meta = read_meta(name)
+    state = entry_state(meta, schema, sources)
+    if state == "touched":
+        # Contents are unchanged, so just record the new mtimes to avoid
+        # hashing the sources again next time
+        meta["sources"] = [fingerprint(source["path"]) for source in meta["sources"]]
+        _write_meta(entry_dir(name), meta)
+        state = "fresh"
+    if state == "fresh":
+        try:
+            return state, _load_arrays(name, meta)
+        except (FileNotFoundError, ValueError):
+            pass
+    return state, None
+
+
+# Returns the arrays produced by build(), reusing the copy saved under
+# cache_dir()/name if none of the source files or the schema have changed since
+# it was written. Cached arrays are memory-mapped read-only.
+def cached_arrays(name, keys, sources, schema, build):
+    with profiling.stage(name):
+        state, arrays = lookup_arrays(name, sources, schema)
+        if arrays is not None:
+            profiling.annotate(cache="hit")
+            return arrays
+
+        profiling.annotate(cache=state)
+        arrays = build()
+        with profiling.stage("cache_store"):
+            store_arrays(name, keys, arrays, sources, schema)
+        return arrays
+
+
+def list_entries():
+    directory = cache_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(entry_dir(name), META_FILE))
+    )
+
+
+def entry_size(name):
+    path = entry_dir(name)
+    return sum(
+        os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path)
+    )
+
+
+def purge(names):
+    for name in names:
+        shutil.rmtree(entry_dir(name), ignore_errors=True)
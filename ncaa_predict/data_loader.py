@@ -1,11 +1,14 @@
 from enum import Enum, unique
+import functools
+import mmap
 import multiprocessing
 import os
 
-import keras
 import numpy as np
 import pandas as pd
 
+from ncaa_predict import cache, profiling
+
 
 # All teams need to be the same size, so we pad them to this size
 # or reduce to this size
@@ -20,21 +23,6 @@ class Class(Enum):
     SENIOR = (0, 0, 0, 1, 0)
     UNKNOWN = (0, 0, 0, 0, 1)
 
-    @staticmethod
-    def from_col(col):
-        if col == "Fr.":
-            return Class.FRESHMAN
-        elif col == "Jr.":
-            return Class.JUNIOR
-        elif col == "So.":
-            return Class.SOPHOMORE
-        elif col == "Sr.":
-            return Class.SENIOR
-        elif col == "---":
-            return Class.UNKNOWN
-        else:
-            raise NotImplementedError("%s is not a known Class" % col)
-
 
 @unique
 class Position(Enum):
@@ -43,18 +31,23 @@ class Position(Enum):
     FORWARD = (0, 0, 1, 0)
     CENTER = (0, 0, 0, 1)
 
-    @staticmethod
-    def from_col(col):
-        if col in ("G", "Guard"):
-            return Position.GUARD
-        elif col in ("F", "Forward"):
-            return Position.FORWARD
-        elif col == "C":
-            return Position.CENTER
-        elif col is np.nan:
-            return Position.NONE
-        else:
-            raise NotImplementedError("%s is not a known Position" % col)
+
+# Values seen in the CSVs for each category. Missing positions are NONE, but
+# any value not listed here is an error.
+CLASS_NAMES = {
+    "Fr.": Class.FRESHMAN,
+    "Jr.": Class.JUNIOR,
+    "So.": Class.SOPHOMORE,
+    "Sr.": Class.SENIOR,
+    "---": Class.UNKNOWN,
+}
+POSITION_NAMES = {
+    "G": Position.GUARD,
+    "Guard": Position.GUARD,
+    "F": Position.FORWARD,
+    "Forward": Position.FORWARD,
+    "C": Position.CENTER,
+}
 
 
 PLAYER_FLOAT_COLUMNS = [
@@ -86,32 +79,125 @@ PLAYER_FEATURE_COLUMNS = PLAYER_FLOAT_COLUMNS + PLAYER_CATEGORICAL_COLUMNS
 N_FEATURES = len(PLAYER_FLOAT_COLUMNS) + len(Position) + len(Class)
 
 
+# Bump this when the way features are built changes, so cached features get
+# rebuilt
+FEATURE_VERSION = 3
+FEATURE_SCHEMA = {
+    "version": FEATURE_VERSION,
+    "player_feature_columns": PLAYER_FEATURE_COLUMNS,
+    "n_players": N_PLAYERS,
+    "n_features": N_FEATURES,
+}
+
+
+# Without a validation year, this fraction of the training games (chosen at
+# random by validation_split()) is held out for validation
+VALIDATION_FRACTION = 0.1
+
 THIS_DIR = os.path.dirname(__file__)
 
 
+# The directory relative data paths (like csv/ncaa_games_2017.csv) are under.
+# It's read when it's used rather than on import, so a process can point it
+# somewhere else after importing this module (like the benchmarks do).
+def data_dir():
+    return os.environ.get("NCAA_PREDICT_DATA_DIR", os.path.join(THIS_DIR, ".."))
+
+
+def data_path(path):
+    return os.path.join(data_dir(), path)
+
+
+def games_csv(year):
+    return "csv/ncaa_games_%s.csv" % year
+
+
+def players_csv(year):
+    return "csv/ncaa_players_%s.csv" % year
+
+
 def load_csv(path):
-    path = os.path.join(THIS_DIR, "..", path)
-    df = pd.read_csv(path)
-    df = df.apply(pd.to_numeric, errors="ignore")
-    return df
+    with profiling.stage("load_csv", path=path):
+        df = pd.read_csv(data_path(path))
+        df = df.apply(pd.to_numeric, errors="ignore")
+        return df
+
+
+GAME_COLUMNS = [
+    "year",
+    "game_date",
+    "school_id",
+    "opponent_id",
+    "score",
+    "opponent_score",
+]
 
 
 def load_ncaa_games(year):
-    columns = ["year", "school_id", "opponent_id", "score", "opponent_score"]
-    path = "csv/ncaa_games_%s.csv" % year
-    return load_csv(path)[columns].dropna()
+    return load_csv(games_csv(year))[GAME_COLUMNS].dropna()
+
+
+# Every game between two schools in the data set is listed twice, once in each
+# school's schedule. Returns a mask that keeps only the first listing of each
+# game, matched by date, teams and score.
+def unique_games(games):
+    school = games["school_id"].values
+    opponent = games["opponent_id"].values
+    score = games["score"].values
+    opponent_score = games["opponent_score"].values
+    swap = school > opponent
+    key = pd.DataFrame(
+        {
+            "date": games["game_date"].values,
+            "a": np.where(swap, opponent, school),
+            "b": np.where(swap, school, opponent),
+            "a_score": np.where(swap, opponent_score, score),
+            "b_score": np.where(swap, score, opponent_score),
+        }
+    )
+    return ~key.duplicated().values
+
+
+# Converts a column of category names to indexes into list(enum)
+def _category_codes(col, names, enum, missing=None):
+    members = list(enum)
+    categories = list(names)
+    lookup = np.array([members.index(names[name]) for name in categories])
+    codes = pd.Categorical(col, categories=categories).codes
+    unknown = codes < 0
+    if missing is not None:
+        unknown &= col.notna().values
+    if unknown.any():
+        raise NotImplementedError(
+            "%s is not a known %s" % (col[unknown].iloc[0], enum.__name__)
+        )
+    if missing is not None:
+        lookup = np.append(lookup, members.index(missing))
+    return lookup[codes].astype(np.int8)
+
 
+def _one_hot(enum):
+    return np.array([member.value for member in enum], dtype=np.float32)
 
+
+# Returns one row per player, sorted by school and then by games played (most
+# first), with position and class as indexes into list(Position) and
+# list(Class)
 def load_ncaa_players(year):
+    return prepare_players(load_csv(players_csv(year)))
+
+
+@profiling.timed
+def prepare_players(players):
     columns = PLAYER_FEATURE_COLUMNS + ["school_id"]
-    path = "csv/ncaa_players_%s.csv" % year
-    players = load_csv(path)
     # drop players with height < 4 ft since the data set has some weirdness like 0 height and 6 in tall players
     # Replace players with missing height or height < 4 ft with 75 in
     players.loc[players["height"] < 48, "height"] = 75
     players = players.fillna({"height": 75})
-    players["position"] = players["position"].apply(Position.from_col)
-    players["class"] = players["class"].apply(Class.from_col)
+    players["position"] = _category_codes(
+        players["position"], POSITION_NAMES, Position, missing=Position.NONE
+    )
+    players["class"] = _category_codes(players["class"], CLASS_NAMES, Class)
     players = players.fillna({"games": 0})  # N/A games presumably means 0
 
     # Generate rate / average columns since the source data is inconsistent about if these are 0-1 or 0-100
@@ -133,8 +219,12 @@ def load_ncaa_players(year):
     # Fill remaining N/A columns with 0 (generally people who have played 0 games)
     players = players.fillna(0)
 
-    players = players.sort_values("g", ascending=False).groupby("school_id")
-    return players
+    # Use a stable sort so players with the same number of games stay in file
+    # order, which keeps the team the same when only some schools are loaded
+    players = players.sort_values(
+        ["school_id", "g"], ascending=[True, False], kind="mergesort"
+    )
+    return players.reset_index(drop=True)
 
 
 def load_ncaa_schools():
@@ -142,66 +232,232 @@ def load_ncaa_schools():
     return load_csv(path)[["school_id", "school_name"]]
 
 
-def _setup_players(team):
-    team = np.hstack(
-        [
-            team[PLAYER_FLOAT_COLUMNS].values,
-            [p.value for p in team["position"].values],
-            [c.value for c in team["class"].values],
-        ]
-    )
-    if len(team) > N_PLAYERS:
-        team = team[:N_PLAYERS]
+# Returns (school_ids, teams) for the load_ncaa_players() DataFrame, using the
+# N_PLAYERS players on each team who played in the most games
+@profiling.timed
+def build_teams(players):
+    rank = players.groupby("school_id").cumcount().values
+    team_size = players.groupby("school_id")["school_id"].transform("size").values
     # Drop data for teams that are too small to make sense
-    elif len(team) < N_PLAYERS:
-        return None
+    players = players[(rank < N_PLAYERS) & (team_size >= N_PLAYERS)]
+
+    n_floats = len(PLAYER_FLOAT_COLUMNS)
+    n_positions = len(Position)
+    block = np.empty(shape=[len(players), N_FEATURES], dtype=np.float32)
+    block[:, :n_floats] = players[PLAYER_FLOAT_COLUMNS].values
+    block[:, n_floats : n_floats + n_positions] = _one_hot(Position)[
+        players["position"].values
+    ]
+    block[:, n_floats + n_positions :] = _one_hot(Class)[players["class"].values]
 
-    missing_players = N_PLAYERS - len(team)
-    if missing_players > 0:
-        missing_player = [0] * team.shape[1]
-        team = np.vstack([team] + [missing_player] * missing_players)
-    return team
+    school_ids = players["school_id"].values[::N_PLAYERS].astype(np.int64)
+    teams = block.reshape([-1, N_PLAYERS, N_FEATURES])
+    profiling.record_arrays(teams=teams)
+    return school_ids, teams
 
 
-def get_players_for_team(players, school_id):
-    try:
-        team = players.get_group(school_id)
-    except KeyError:
+def get_players_for_team(team_ids, teams, school_id):
+    row = team_rows(team_ids, [school_id])[0]
+    if row < 0:
         return None
+    return teams[row]
+
+
+# Returns (school_ids, teams), where teams[i] is the
+# [N_PLAYERS, N_FEATURES] matrix for school_ids[i]. Teams that are too small
+# are left out.
+def load_teams(year):
+    return cache.cached_arrays(
+        "teams_%s" % year,
+        ["school_ids", "teams"],
+        [data_path(players_csv(year))],
+        FEATURE_SCHEMA,
+        lambda: build_teams(load_ncaa_players(year)),
+    )
 
-    return _setup_players(team)
 
+# Returns the row in the load_teams() arrays for each of school_ids, or -1 for
+# schools that don't have a team
+def team_rows(team_ids, school_ids):
+    return pd.Index(team_ids).get_indexer(school_ids)
 
-def load_data(year):
+
+def _build_game_table(year):
     print("Loading data for %s" % year)
     games = load_ncaa_games(year)
-    players = load_ncaa_players(year)
-    teams = {school_id: _setup_players(team) for school_id, team in players}
-    print("Loaded %s teams" % len(teams))
-
-    games = [
-        game
-        for game in games.itertuples()
-        if teams.get(game.school_id) is not None
-        and teams.get(game.opponent_id) is not None
-    ]
-    num_games = len(games)
-    features = np.empty(shape=[num_games, 2, N_PLAYERS, N_FEATURES], dtype=np.float32)
-    labels = np.empty(shape=[num_games, 2], dtype=np.int8)
-    for i, game in enumerate(games):
-        this_team = teams[game.school_id]
-        other_team = teams[game.opponent_id]
-        features[i] = [this_team, other_team]
-        labels[i] = [1, 0] if game.score > game.opponent_score else [0, 1]
-    print("Loaded %s games" % num_games)
-    assert i == num_games - 1
-    return features, labels
+    listings = len(games)
+    games = games[unique_games(games)]
+    print("Found %s unique games in %s listings" % (len(games), listings))
+    team_ids, _ = load_teams(year)
+    print("Loaded %s teams" % len(team_ids))
+
+    this_rows = team_rows(team_ids, games["school_id"].values)
+    other_rows = team_rows(team_ids, games["opponent_id"].values)
+    found = (this_rows >= 0) & (other_rows >= 0)
+    won = games["score"].values[found] > games["opponent_score"].values[found]
+    table = np.stack([this_rows[found], other_rows[found], won], axis=1)
+    print("Loaded %s games" % len(table))
+    # The listing that's kept is usually from the school with the lower ID, so
+    # store each game from a random (but fixed) team's perspective instead
+    flip = np.random.default_rng(year).random(len(table)) < 0.5
+    table = swap_games(table.astype(np.int32), flip)
+    profiling.record_arrays(games=table)
+    return (table,)
+
+
+# Returns games (a game table) from the other team's perspective: teams a and
+# b swapped and the labels flipped. If mask is given, only those rows are
+# swapped.
+def swap_games(games, mask=None):
+    swapped = games[:, [1, 0, 2]]
+    swapped[:, 2] = 1 - swapped[:, 2]
+    if mask is not None:
+        swapped = np.where(mask[:, None], swapped, games)
+    return swapped
+
+
+# Returns (teams, games), where teams is the load_teams() tensor and games is
+# an int32 [n_games, 3] table of (team_a_row, team_b_row, label) rows, with
+# label 1 if team a won. Each game is only in the table once (see
+# unique_games()); use swap_games() to also see it from the other side. This
+# is much smaller than load_data() since each team is only stored once.
+def load_game_table(year):
+    (games,) = cache.cached_arrays(
+        "game_table_%s" % year,
+        ["games"],
+        [data_path(games_csv(year)), data_path(players_csv(year))],
+        FEATURE_SCHEMA,
+        lambda: _build_game_table(year),
+    )
+    _, teams = load_teams(year)
+    return teams, games
 
 
-def load_data_multiyear(years):
+@profiling.timed
+def load_game_table_multiyear(years):
     with multiprocessing.Pool() as p:
-        data = p.map(load_data, years)
-    features = np.vstack([features for features, _ in data])
-    labels = np.vstack([labels for _, labels in data])
-    assert len(features) == len(labels)
+        data = profiling.gather(
+            p.map(functools.partial(profiling.collect, load_game_table), years)
+        )
+    with profiling.stage("gather"):
+        offsets = np.cumsum([0] + [len(teams) for teams, _ in data[:-1]])
+        teams = np.concatenate([teams for teams, _ in data])
+        games = np.concatenate(
+            [games + [offset, offset, 0] for offset, (_, games) in zip(offsets, data)]
+        ).astype(np.int32)
+        profiling.record_arrays(teams=teams, games=games)
+    return teams, games
+
+
+# Writes into out if given, which must be a [len(games), 2, N_PLAYERS,
+# N_FEATURES] float32 array
+@profiling.timed
+def game_features(teams, games, out=None):
+    features = out
+    if features is None:
+        features = np.empty(
+            shape=[len(games), 2, N_PLAYERS, N_FEATURES], dtype=np.float32
+        )
+    features[:, 0] = teams[games[:, 0]]
+    features[:, 1] = teams[games[:, 1]]
+    profiling.record_arrays(features=features)
+    return features
+
+
+def game_labels(games, out=None):
+    labels = out
+    if labels is None:
+        labels = np.empty(shape=[len(games), 2], dtype=np.int8)
+    labels[:, 0] = games[:, 2]
+    labels[:, 1] = 1 - games[:, 2]
+    return labels
+
+
+def _build_data(year):
+    teams, games = load_game_table(year)
+    return game_features(teams, games), game_labels(games)
+
+
+def load_data(year):
+    return cache.cached_arrays(
+        "data_%s" % year,
+        ["features", "labels"],
+        [data_path(games_csv(year)), data_path(players_csv(year))],
+        FEATURE_SCHEMA,
+        lambda: _build_data(year),
+    )
+
+
+# An array in anonymous shared memory, which forked workers can write to
+def shared_array(shape, dtype):
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    buffer = mmap.mmap(-1, max(count * dtype.itemsize, 1))
+    return np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+
+
+def _count_games(year):
+    _, games = load_game_table(year)
+    return len(games)
+
+
+# Builds (or loads from the cache) each year's game table in parallel, and
+# returns the number of games in each
+def count_games(years):
+    with multiprocessing.Pool() as p:
+        return profiling.gather(
+            p.map(functools.partial(profiling.collect, _count_games), years)
+        )
+
+
+# The (features, labels) output of load_data_multiyear(), set in each worker
+_output = None
+
+
+def _set_output(features, labels):
+    global _output
+    _output = (features, labels)
+
+
+def _fill_year(year, start):
+    teams, games = load_game_table(year)
+    features, labels = _output
+    end = start + len(games)
+    game_features(teams, games, out=features[start:end])
+    game_labels(games, out=labels[start:end])
+
+
+# Like np.vstack([load_data(year) for year in years]), but workers build each
+# year's features directly into one preallocated shared array, so nothing is
+# pickled back to this process or copied again to concatenate it. The game
+# tables are built (or loaded from the cache) and counted first so each year's
+# rows are known before allocating.
+@profiling.timed
+def load_data_multiyear(years):
+    counts = count_games(years)
+    starts = np.cumsum([0] + counts[:-1])
+    with profiling.stage("allocate"):
+        n_games = sum(counts)
+        features = shared_array([n_games, 2, N_PLAYERS, N_FEATURES], np.float32)
+        labels = shared_array([n_games, 2], np.int8)
+        profiling.record_arrays(features=features, labels=labels)
+    # The workers need to inherit the shared memory, so they have to be forked
+    context = multiprocessing.get_context("fork")
+    with context.Pool(initializer=_set_output, initargs=(features, labels)) as p:
+        profiling.gather(
+            p.starmap(
+                functools.partial(profiling.collect, _fill_year),
+                zip(years, starts.tolist()),
+            )
+        )
     return features, labels
+
+
+# Splits the rows of n_games games (like load_data_multiyear()'s rows, with the
+# years in sorted order) into (train rows, validation rows), holding out a
+# random `fraction` of them. The same seed always holds out the same games, so
+# train.py and sweep.py validate on the same games.
+def validation_split(n_games, seed=0, fraction=VALIDATION_FRACTION):
+    rows = np.random.default_rng(seed).permutation(n_games)
+    n_validation = int(n_games * fraction)
+    return rows[n_validation:], rows[:n_validation]
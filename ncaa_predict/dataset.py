@@ -0,0 +1,140 @@
+import itertools
+import math
+
+import keras
+import numpy as np
+import tensorflow as tf
+
+from ncaa_predict.data_loader import load_game_table, load_teams
+
+
+# Games gathered per read from a year's shard
+CHUNK_SIZE = 1024
+
+
+# Feeds Keras batches of the given rows of load_data()-style (features, labels)
+# arrays, without copying anything but the current batch. This lets several
+# processes train from the same shared arrays. With mirror, each batch has
+# batch_size // 2 games, each seen from both teams' perspectives.
+class ArraySequence(keras.utils.Sequence):
+    def __init__(
+        self,
+        features,
+        labels,
+        rows,
+        batch_size,
+        shuffle=False,
+        seed=None,
+        mirror=False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.features = features
+        self.labels = labels
+        self.rows = rows
+        self.mirror = mirror
+        self.batch_size = max(1, batch_size // 2) if mirror else batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = np.arange(len(rows))
+        if shuffle:
+            self.rng.shuffle(self.order)
+
+    def __len__(self):
+        return math.ceil(len(self.rows) / self.batch_size)
+
+    def __getitem__(self, i):
+        # Reading the rows in order is faster, and the batch order doesn't
+        # matter
+        rows = np.sort(
+            self.rows[self.order[i * self.batch_size : (i + 1) * self.batch_size]]
+        )
+        features, labels = self.features[rows], self.labels[rows]
+        if self.mirror:
+            features = np.concatenate([features, features[:, ::-1]])
+            labels = np.concatenate([labels, labels[:, ::-1]])
+        return features, labels
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+# Streams (features, labels) batches for years. Each year's game table is read
+# from its shard in the feature cache, and only game rows go through the
+# shuffle buffer; features are gathered from the (small) team tensors once
+# rows are batched, so the full feature tensor is never in memory. Up to
+# parallel_reads years are read at a time and interleaved. With shuffle, the
+# order of years and of games within each year changes every epoch, and games
+# from different years are mixed through a shuffle_buffer-game buffer. rows,
+# if given, are the rows of the games to read (like load_data_multiyear()'s,
+# with the years in sorted order), for holding out validation games. With
+# mirror, each batch has batch_size // 2 games, each seen from both teams'
+# perspectives (the game tables only store each game once).
+def game_dataset(
+    years,
+    batch_size,
+    shuffle=False,
+    shuffle_buffer=0,
+    parallel_reads=1,
+    rows=None,
+    seed=None,
+    mirror=False,
+):
+    years = sorted(years)
+    all_teams = [load_teams(year)[1] for year in years]
+    offsets = dict(zip(years, np.cumsum([0] + [len(t) for t in all_teams[:-1]])))
+    teams = tf.constant(np.concatenate(all_teams))
+    if rows is not None:
+        # Each year's rows, counted from the start of that year's games
+        counts = [len(load_game_table(year)[1]) for year in years]
+        starts = np.cumsum([0] + counts)
+        rows = np.sort(rows)
+        year_rows = {
+            year: rows[(rows >= start) & (rows < end)] - start
+            for year, start, end in zip(years, starts[:-1], starts[1:])
+        }
+    calls = itertools.count()
+
+    def read_year(year):
+        year = int(year)
+        _, games = load_game_table(year)
+        if rows is not None:
+            games = games[year_rows[year]]
+        order = np.arange(len(games))
+        if shuffle:
+            rng_seed = None if seed is None else [seed, year, next(calls)]
+            np.random.default_rng(rng_seed).shuffle(order)
+        offset = np.array([offsets[year], offsets[year], 0], dtype=np.int32)
+        for start in range(0, len(games), CHUNK_SIZE):
+            yield games[order[start : start + CHUNK_SIZE]] + offset
+
+    def features_and_labels(games):
+        if mirror:
+            swapped = tf.stack([games[:, 1], games[:, 0], 1 - games[:, 2]], axis=1)
+            games = tf.concat([games, swapped], axis=0)
+        features = tf.gather(teams, games[:, :2])
+        labels = tf.cast(tf.stack([games[:, 2], 1 - games[:, 2]], axis=1), tf.int8)
+        return features, labels
+
+    dataset = tf.data.Dataset.from_tensor_slices(years)
+    if shuffle:
+        dataset = dataset.shuffle(len(years), seed=seed)
+    dataset = dataset.interleave(
+        lambda year: tf.data.Dataset.from_generator(
+            read_year,
+            args=(year,),
+            output_signature=tf.TensorSpec([None, 3], tf.int32),
+        ),
+        cycle_length=parallel_reads,
+        num_parallel_calls=parallel_reads,
+        deterministic=not shuffle,
+    )
+    games_per_batch = max(1, batch_size // 2) if mirror else batch_size
+    if shuffle and shuffle_buffer > 1:
+        dataset = dataset.unbatch().shuffle(shuffle_buffer, seed=seed)
+        dataset = dataset.batch(games_per_batch)
+    else:
+        dataset = dataset.rebatch(games_per_batch)
+    dataset = dataset.map(features_and_labels, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ncaa_predict import cache, profiling
+from ncaa_predict.backtest import DEFAULT_BATCH_SIZE
+from ncaa_predict.data_loader import (
+    FEATURE_SCHEMA,
+    data_path,
+    game_features,
+    games_csv,
+    load_game_table,
+    players_csv,
+)
+from ncaa_predict.models import load_model
+
+
+# Bump the version when the way member predictions are cached changes. Cached
+# predictions are also stale when the features they were made from change.
+PREDICTIONS_VERSION = 2
+PREDICTIONS_SCHEMA = {"version": PREDICTIONS_VERSION, "features": FEATURE_SCHEMA}
+
+
+# Returns weights (one per model, or equal weights if None) scaled to sum to 1
+def normalize_weights(weights, n_models):
+    if weights is None:
+        weights = [1] * n_models
+    if len(weights) != n_models:
+        raise Exception("Got %s weights for %s models" % (len(weights), n_models))
+    weights = np.asarray(weights, dtype=np.float32)
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise Exception("Weights need to be non-negative and not all 0")
+    return weights / weights.sum()
+
+
+# Several models whose predictions are averaged (weighted by weights), with the
+# same predict() and predict_on_batch() as a Keras model. Each batch is given
+# to every member, which are run in `jobs` threads (NumPy and TensorFlow both
+# release the GIL while they work).
+#
+# predict_year() runs the members over a whole year of games, building each
+# batch once for all of them. With cache_predictions, each member's predictions
+# for the year are saved in the feature cache (one entry per member and year,
+# shared by every ensemble the member is in), so adding a member to an
+# ensemble only runs the new member. Cached predictions are thrown out when a
+# member's file or the year's data changes, like cached features.
+class Ensemble:
+    def __init__(
+        self, paths, models, weights=None, jobs=None, cache_predictions=True
+    ):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.models = list(models)
+        self.weights = normalize_weights(weights, len(self.models))
+        self.jobs = min(jobs or os.cpu_count(), len(self.models))
+        self.cache_predictions = cache_predictions
+        self.cache_names = [
+            "predictions_%s" % hashlib.sha1(path.encode()).hexdigest()[:16]
+            for path in self.paths
+        ]
+
+    # Returns the [len(members), len(x), ...] predictions of each of members
+    # (indexes into self.models, or all of them if None), running them in
+    # self.jobs threads
+    def member_predictions(self, x, members=None):
+        if members is None:
+            members = range(len(self.models))
+        x = np.asarray(x, dtype=np.float32)
+
+        def predict(i):
+            return np.asarray(self.models[i].predict_on_batch(x))
+
+        if self.jobs == 1 or len(members) == 1:
+            return np.stack([predict(i) for i in members])
+        with ThreadPoolExecutor(self.jobs) as executor:
+            return np.stack(list(executor.map(predict, members)))
+
+    def predict_on_batch(self, x):
+        return np.tensordot(self.weights, self.member_predictions(x), axes=1)
+
+    def predict(self, x, batch_size=None, verbose=0):
+        if batch_size is None or len(x) <= batch_size:
+            return self.predict_on_batch(x)
+        return np.concatenate(
+            [
+                self.predict_on_batch(x[start : start + batch_size])
+                for start in range(0, len(x), batch_size)
+            ]
+        )
+
+    # Returns (labels, probs) like backtest.predict_year(), which calls this
+    def predict_year(self, year, batch_size=DEFAULT_BATCH_SIZE):
+        teams, games = load_game_table(year)
+        names = ["%s_%s" % (name, year) for name in self.cache_names]
+        data = [data_path(games_csv(year)), data_path(players_csv(year))]
+        sources = [[path] + data for path in self.paths]
+        probs = [None] * len(self.models)
+        if self.cache_predictions:
+            for i, name in enumerate(names):
+                _, arrays = cache.lookup_arrays(name, sources[i], PREDICTIONS_SCHEMA)
+                if arrays is not None:
+                    probs[i] = arrays[0]
+
+        missing = [i for i, member_probs in enumerate(probs) if member_probs is None]
+        profiling.annotate(cached_members=len(self.models) - len(missing))
+        if missing:
+            for i in missing:
+                probs[i] = np.empty(len(games), dtype=np.float32)
+            for start in range(0, len(games), batch_size):
+                x = game_features(teams, games[start : start + batch_size])
+                predictions = self.member_predictions(x, missing)
+                for i, member_predictions in zip(missing, predictions):
+                    probs[i][start : start + len(x)] = member_predictions[:, 0]
+            if self.cache_predictions:
+                for i in missing:
+                    cache.store_arrays(
+                        names[i], ["probs"], [probs[i]], sources[i], PREDICTIONS_SCHEMA
+                    )
+        return games[:, 2], self.weights @ np.stack(probs)
+
+
+# Loads the model at each of paths (see models.load_model()). Returns the
+# model itself if there's only one and no weights, or an Ensemble of them.
+def load_models(paths, weights=None, jobs=None, cache_predictions=True):
+    if len(paths) == 1 and weights is None:
+        return load_model(paths[0])
+    models = [load_model(path) for path in paths]
+    return Ensemble(paths, models, weights, jobs, cache_predictions)
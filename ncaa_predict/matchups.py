@@ -0,0 +1,76 @@
+import numpy as np
+
+from ncaa_predict.data_loader import game_features, team_rows
+
+
+DEFAULT_BATCH_SIZE = 10000
+
+# A win probability source is a function taking two equal-length arrays of
+# school IDs and returning the probability that each team in the first array
+# beats the corresponding team in the second.
+
+
+def _rows(team_ids, school_ids, what):
+    rows = team_rows(team_ids, school_ids)
+    if (rows < 0).any():
+        raise Exception(
+            "Couldn't find %s for school ID [%s]"
+            % (what, np.asarray(school_ids)[rows < 0][0])
+        )
+    return rows
+
+
+def model_win_probability(model, team_ids, teams, batch_size=DEFAULT_BATCH_SIZE):
+    def win_probability(a_ids, b_ids):
+        games = np.stack(
+            [_rows(team_ids, a_ids, "players"), _rows(team_ids, b_ids, "players")],
+            axis=1,
+        )
+        x = game_features(teams, games)
+        return model.predict(x=x, batch_size=batch_size, verbose=0)[:, 0]
+
+    return win_probability
+
+
+def matrix_win_probability(school_ids, probs):
+    def win_probability(a_ids, b_ids):
+        a_rows = _rows(school_ids, a_ids, "win probabilities")
+        b_rows = _rows(school_ids, b_ids, "win probabilities")
+        return probs[a_rows, b_rows]
+
+    return win_probability
+
+
+# Returns the [n_teams, n_teams] matrix where probs[i, j] is the probability
+# that teams[i] beats teams[j], predicting batch_size games at a time
+def build_win_matrix(model, teams, batch_size=DEFAULT_BATCH_SIZE):
+    n_teams = len(teams)
+    probs = np.empty(shape=[n_teams, n_teams], dtype=np.float32)
+    rows_per_batch = max(1, batch_size // n_teams)
+    for start in range(0, n_teams, rows_per_batch):
+        rows = np.arange(start, min(start + rows_per_batch, n_teams))
+        games = np.stack(
+            [np.repeat(rows, n_teams), np.tile(np.arange(n_teams), len(rows))],
+            axis=1,
+        )
+        x = game_features(teams, games)
+        predictions = model.predict(x=x, batch_size=len(x), verbose=0)[:, 0]
+        probs[rows] = predictions.reshape([len(rows), n_teams])
+    np.fill_diagonal(probs, 0.5)
+    return probs
+
+
+def save_win_matrix(path, school_ids, probs):
+    np.savez(path, school_ids=school_ids, probs=probs)
+
+
+def load_win_matrix(path):
+    with np.load(path) as data:
+        if "probs" not in data:
+            if "activations" in data:
+                raise Exception(
+                    "%s is a model from ./export_model.py, not a win matrix; "
+                    "pass it with --model-in instead" % path
+                )
+            raise Exception("%s isn't a win matrix from ./build_win_matrix.py" % path)
+        return data["school_ids"], data["probs"]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+# Probabilities are clipped to this far from 0 and 1 so one confident wrong
+# prediction doesn't make the log loss infinite
+EPSILON = 1e-7
+
+
+# Each of these takes labels (1 if team a won) and the predicted probability
+# that team a won
+
+
+def accuracy(labels, probs):
+    return float(np.mean((probs > 0.5) == (labels == 1)))
+
+
+def log_loss(labels, probs):
+    probs = np.clip(probs.astype(np.float64), EPSILON, 1 - EPSILON)
+    return float(-np.mean(np.where(labels == 1, np.log(probs), np.log(1 - probs))))
+
+
+# Area under the ROC curve, from the ranks of the predictions (the
+# Mann-Whitney U statistic). NaN if every game has the same label.
+def auc(labels, probs):
+    positive = labels == 1
+    n_positive = int(positive.sum())
+    n_negative = len(labels) - n_positive
+    if n_positive == 0 or n_negative == 0:
+        return float("nan")
+    ranks = pd.Series(probs).rank().values
+    u = ranks[positive].sum() - n_positive * (n_positive + 1) / 2
+    return float(u / (n_positive * n_negative))
+
+
+def score(labels, probs):
+    return {
+        "games": len(labels),
+        "accuracy": accuracy(labels, probs),
+        "auc": auc(labels, probs),
+        "log_loss": log_loss(labels, probs),
+    }
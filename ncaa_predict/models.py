@@ -0,0 +1,44 @@
+from ncaa_predict import numpy_model
+
+
+DEFAULT_HIDDEN_LAYERS = [16]
+DEFAULT_REGULARIZER = "L1L2"
+DEFAULT_OPTIMIZER = "rmsprop"
+
+
+# The winner classifier: the players of both teams are flattened and fed
+# through Dense layers of the given sizes, with a softmax over (a wins, b
+# wins). regularizer and optimizer are Keras names (regularizer may be None).
+def build_model(
+    hidden_layers=DEFAULT_HIDDEN_LAYERS,
+    regularizer=DEFAULT_REGULARIZER,
+    optimizer=DEFAULT_OPTIMIZER,
+):
+    from keras.models import Sequential
+    from keras.layers import Dense, Flatten
+
+    model = Sequential(
+        [Flatten()]
+        + [
+            Dense(units, activation="relu", kernel_regularizer=regularizer)
+            for units in hidden_layers
+        ]
+        + [Dense(2, activation="softmax")]
+    )
+    model.compile(
+        loss="categorical_crossentropy",
+        optimizer=optimizer,
+        # categorical_crossentropy is the loss without the regularization penalty
+        metrics=["accuracy", "AUC", "Precision", "Recall", "categorical_crossentropy"],
+    )
+    return model
+
+
+# Loads a model saved by Keras, or one exported by ./export_model.py as a
+# numpy_model.NumpyModel (which doesn't need TensorFlow)
+def load_model(path):
+    if path.endswith(numpy_model.SUFFIX):
+        return numpy_model.load(path)
+    import keras
+
+    return keras.models.load_model(path)
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+# Exported models are saved with this suffix, which is how load_model() in
+# models.py tells them apart from Keras models
+SUFFIX = ".npz"
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    return np.divide(1, 1 + np.exp(-x, out=x), out=x)
+
+
+def _softmax(x):
+    x -= x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "softmax": _softmax,
+    "tanh": lambda x: np.tanh(x, out=x),
+}
+# Layers that don't do anything at inference time (besides Flatten, which
+# predict_on_batch() always does first)
+PASSTHROUGH_LAYERS = {"InputLayer", "Flatten", "Dropout"}
+
+
+# A model made of Flatten and Dense layers (like the ones models.build_model()
+# makes), run with NumPy. It has the same predict() and predict_on_batch() as
+# a Keras model, so it can be used anywhere they are, without importing
+# TensorFlow or paying for Keras' per-call overhead.
+class NumpyModel:
+    def __init__(self, kernels, biases, activations):
+        self.kernels = [np.asarray(kernel, dtype=np.float32) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = list(activations)
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+        for kernel, bias, activation in zip(
+            self.kernels, self.biases, self.activations
+        ):
+            x = x @ kernel
+            x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    def predict(self, x, batch_size=None, verbose=0):
+        if batch_size is None or len(x) <= batch_size:
+            return self.predict_on_batch(x)
+        return np.concatenate(
+            [
+                self.predict_on_batch(x[start : start + batch_size])
+                for start in range(0, len(x), batch_size)
+            ]
+        )
+
+    def save(self, path):
+        arrays = {"activations": np.array(self.activations)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays["kernel_%d" % i] = kernel
+            arrays["bias_%d" % i] = bias
+        np.savez(path, **arrays)
+
+
+def load(path):
+    with np.load(path) as data:
+        if "activations" not in data:
+            if "probs" in data:
+                raise Exception(
+                    "%s is a win matrix from ./build_win_matrix.py, not a model; "
+                    "pass it with --win-matrix instead" % path
+                )
+            raise Exception("%s isn't a model exported by ./export_model.py" % path)
+        activations = [str(activation) for activation in data["activations"]]
+        kernels = [data["kernel_%d" % i] for i in range(len(activations))]
+        biases = [data["bias_%d" % i] for i in range(len(activations))]
+    return NumpyModel(kernels, biases, activations)
+
+
+# Copies the weights out of a Keras model. Raises an exception if it has any
+# layers (or activations) that NumpyModel can't run.
+def from_keras(model):
+    kernels, biases, activations = [], [], []
+    flattened = len(model.input_shape) <= 2
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind == "Flatten":
+            flattened = True
+        if kind in PASSTHROUGH_LAYERS:
+            continue
+        if kind != "Dense" or not flattened:
+            raise Exception("Can't export %s layer %s" % (kind, layer.name))
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise Exception(
+                "Can't export %s activation in layer %s" % (activation, layer.name)
+            )
+        weights = layer.get_weights()
+        kernels.append(weights[0])
+        # Layers with use_bias=False only have a kernel
+        bias = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1])
+        biases.append(bias)
+        activations.append(activation)
+    return NumpyModel(kernels, biases, activations)
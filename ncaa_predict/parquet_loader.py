@@ -0,0 +1,142 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ncaa_predict.data_loader import (
+    GAME_COLUMNS,
+    data_path,
+    games_csv,
+    load_csv,
+    players_csv,
+    prepare_players,
+)
+
+
+# Alternatives to the CSV loaders in data_loader that read Parquet files made
+# by convert_csvs(). The files have a fixed schema, so column types are the
+# same every year, and the loaders only read the columns they use.
+
+DEFAULT_DIR = "parquet"
+
+ID = pa.int32()
+STAT = pa.float32()
+CATEGORY = pa.dictionary(pa.int8(), pa.string())
+
+GAME_SCHEMA = pa.schema(
+    [
+        ("opponent_name", pa.string()),
+        ("game_date", pa.string()),
+        ("score", STAT),
+        ("opponent_score", STAT),
+        ("location", CATEGORY),
+        ("neutral_site_location", pa.string()),
+        ("game_length", pa.string()),
+        ("attendence", STAT),
+        ("opponent_id", ID),
+        ("year", ID),
+        ("school_id", ID),
+    ]
+)
+
+PLAYER_SCHEMA = pa.schema(
+    [("player_name", pa.string()), ("class", CATEGORY), ("season", pa.string())]
+    + [("position", CATEGORY)]
+    + [
+        (column, STAT)
+        for column in [
+            "height",
+            "g",
+            "fg_made",
+            "fg_attempts",
+            "fg_percent",
+            "3pt_made",
+            "3pt_attempts",
+            "3pt_percent",
+            "freethrows_made",
+            "freethrows_attempts",
+            "freethrows_percent",
+            "rebounds_num",
+            "rebounds_avg",
+            "assists_num",
+            "assists_avg",
+            "blocks_num",
+            "blocks_avg",
+            "steals_num",
+            "steals_avg",
+            "points_num",
+            "points_avg",
+            "turnovers",
+            "dd",
+            "td",
+        ]
+    ]
+    + [("player_id", ID), ("year", ID), ("school_id", ID)]
+)
+
+SCHOOL_SCHEMA = pa.schema([("school_id", ID), ("school_name", pa.string())])
+
+# The columns prepare_players() reads; the rates and averages are recomputed
+PLAYER_COLUMNS = [
+    "school_id",
+    "position",
+    "class",
+    "height",
+    "g",
+    "fg_made",
+    "fg_attempts",
+    "3pt_made",
+    "3pt_attempts",
+    "freethrows_made",
+    "freethrows_attempts",
+    "rebounds_num",
+    "assists_num",
+    "blocks_num",
+    "steals_num",
+    "points_num",
+]
+
+
+def _path(directory, name):
+    return data_path(os.path.join(directory, name + ".parquet"))
+
+
+def _write(df, schema, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    pq.write_table(table, path, compression="zstd")
+
+
+def convert_csvs(years, directory=DEFAULT_DIR):
+    _write(
+        load_csv("csv/ncaa_schools.csv"),
+        SCHOOL_SCHEMA,
+        _path(directory, "ncaa_schools"),
+    )
+    for year in years:
+        print("Converting %s" % year)
+        _write(
+            load_csv(games_csv(year)),
+            GAME_SCHEMA,
+            _path(directory, "ncaa_games_%s" % year),
+        )
+        _write(
+            load_csv(players_csv(year)),
+            PLAYER_SCHEMA,
+            _path(directory, "ncaa_players_%s" % year),
+        )
+
+
+def load_ncaa_games(year, directory=DEFAULT_DIR):
+    path = _path(directory, "ncaa_games_%s" % year)
+    return pd.read_parquet(path, columns=GAME_COLUMNS).dropna()
+
+
+def load_ncaa_players(year, directory=DEFAULT_DIR):
+    path = _path(directory, "ncaa_players_%s" % year)
+    return prepare_players(pd.read_parquet(path, columns=PLAYER_COLUMNS))
+
+
+def load_ncaa_schools(directory=DEFAULT_DIR):
+    return pd.read_parquet(_path(directory, "ncaa_schools"))
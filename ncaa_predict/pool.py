@@ -0,0 +1,204 @@
+import time
+
+import numpy as np
+
+from ncaa_predict.simulate import simulate_winners
+
+
+# Points for each correct pick in each round (ESPN-style)
+DEFAULT_POINTS = [10, 20, 40, 80, 160, 320]
+OBJECTIVES = ["win", "rank"]
+
+# An entry is an array of the team picked to win each game, with games in
+# bracket_slots() order (so entry[i] is the pick for slot n_teams + i).
+
+
+# Makes the favourites more (chalk > 1) or less (chalk < 1) likely to win, for
+# opponents who pick differently than the model
+def sharpen(probs, chalk):
+    a = probs**chalk
+    b = (1 - probs) ** chalk
+    return (a / (a + b)).astype(np.float32)
+
+
+# Returns the entry that picks the more likely winner of every game, like
+# bracket.predict_bracket()
+def favorite_entry(probs, rounds):
+    favorites = (probs > 0.5).astype(np.float32)
+    winners = simulate_winners(favorites, rounds, 1, np.random.default_rng(0))
+    return winners[len(probs) :, 0]
+
+
+# Returns n entries sampled from probs, one per simulated tournament
+def sample_entries(probs, rounds, n, rng):
+    return simulate_winners(probs, rounds, n, rng)[len(probs) :].T.copy()
+
+
+# Scores entries against a fixed set of simulated tournaments, each with its
+# own field of opponents, so every entry is compared on the same outcomes.
+#
+# points[r] is the score for a correct pick in round r, and upset_bonus is
+# added for correctly picking a team that was less than 50% likely to win
+# that game. Opponents' entries are sampled from probs sharpened by chalk;
+# n_opponents of them are scored once, and each simulated pool draws
+# pool_size - 1 of those.
+class PoolScorer:
+    def __init__(
+        self,
+        probs,
+        rounds,
+        points,
+        upset_bonus,
+        pool_size,
+        n_sims,
+        n_opponents,
+        chalk,
+        rng,
+    ):
+        if len(points) != len(rounds):
+            raise Exception(
+                "Got points for %s rounds but the bracket has %s"
+                % (len(points), len(rounds))
+            )
+        n_teams = len(probs)
+        winners = simulate_winners(probs, rounds, n_sims, rng)
+        self.outcomes = winners[n_teams:]
+        # The points for picking each game correctly in each tournament
+        values = np.empty(self.outcomes.shape, dtype=np.int32)
+        for i, (games, left, right) in enumerate(rounds):
+            values[games - n_teams] = points[i]
+            if upset_bonus:
+                a = winners[left]
+                b = winners[right]
+                winner = winners[games]
+                loser = np.where(winner == a, b, a)
+                upset = probs[winner, loser] < 0.5
+                values[games - n_teams] += upset_bonus * upset
+        self.values = values
+
+        self.n_opponents = pool_size - 1
+        opponents = sample_entries(sharpen(probs, chalk), rounds, n_opponents, rng)
+        opponent_scores = self.score(opponents)
+        field = rng.integers(0, n_opponents, size=[n_sims, self.n_opponents])
+        field_scores = opponent_scores[field, np.arange(n_sims)[:, None]]
+        # Each tournament's opponent scores, sorted and offset by more than the
+        # highest possible score, so finish() can search every tournament's
+        # scores with one searchsorted()
+        max_score = values.sum(axis=0).max()
+        self.offsets = np.arange(n_sims, dtype=np.int64) * (max_score + 1)
+        field_scores = np.sort(field_scores, axis=1) + self.offsets[:, None]
+        self.sorted_scores = field_scores.ravel()
+
+    # Returns the [n_entries, n_sims] score of each entry in each tournament
+    def score(self, entries):
+        entries = np.asarray(entries)
+        scores = np.zeros([len(entries), self.outcomes.shape[1]], dtype=np.int32)
+        for game, (outcome, value) in enumerate(zip(self.outcomes, self.values)):
+            scores += value * (outcome == entries[:, game, None])
+        return scores
+
+    # Returns (expected score, probability of winning the pool with ties split,
+    # standard error of that probability, expected finishing place) arrays for
+    # entries
+    def finish(self, entries):
+        scores = self.score(entries)
+        keys = scores + self.offsets
+        first = np.arange(len(self.offsets)) * self.n_opponents
+        below = np.searchsorted(self.sorted_scores, keys, side="left") - first
+        not_above = np.searchsorted(self.sorted_scores, keys, side="right") - first
+        above = self.n_opponents - not_above
+        tied = not_above - below
+        wins = np.where(above == 0, 1 / (1 + tied), 0)
+        win_error = wins.std(axis=1) / np.sqrt(wins.shape[1])
+        place = (1 + above + tied / 2).mean(axis=1)
+        return scores.mean(axis=1), wins.mean(axis=1), win_error, place
+
+
+# Returns each game's (parent game or -1, left slot, right slot)
+def _game_tree(rounds, n_teams):
+    n_games = sum(len(games) for games, _, _ in rounds)
+    parents = np.full(n_games, -1)
+    children = np.empty([n_games, 2], dtype=np.int64)
+    for games, left, right in rounds:
+        children[games - n_teams] = np.stack([left, right], axis=1)
+        for side in [left, right]:
+            from_game = side >= n_teams
+            parents[side[from_game] - n_teams] = games[from_game] - n_teams
+    return parents, children
+
+
+# Returns a copy of entry with the loser of a random game picked instead, and
+# picked in every later game the old pick was picked to win
+def mutate(entry, parents, children, n_teams, rng):
+    entry = entry.copy()
+    game = rng.integers(len(entry))
+    old = entry[game]
+    sides = [
+        slot if slot < n_teams else entry[slot - n_teams] for slot in children[game]
+    ]
+    new = sides[1] if sides[0] == old else sides[0]
+    while game >= 0 and entry[game] == old:
+        entry[game] = new
+        game = parents[game]
+    return entry
+
+
+def _objective(finish, objective):
+    _, win, _, place = finish
+    return win if objective == "win" else -place
+
+
+# Searches for the entry with the best pool finish according to scorer:
+# the highest chance of winning (objective="win") or the best expected place
+# ("rank"). Starts from the favourites' entry and entries sampled from probs,
+# then keeps the best `beam` entries and tries random changes to them (plus
+# new samples) until time_limit seconds have passed. Returns the best entries
+# found, best first.
+def optimize(
+    scorer,
+    probs,
+    rounds,
+    rng,
+    objective="win",
+    time_limit=30,
+    beam=16,
+    batch_size=256,
+):
+    n_teams = len(probs)
+    parents, children = _game_tree(rounds, n_teams)
+    start = time.perf_counter()
+    seen = set()
+    best = []
+    best_values = np.empty(0)
+    candidates = np.concatenate(
+        [
+            [favorite_entry(probs, rounds)],
+            sample_entries(probs, rounds, batch_size, rng),
+        ]
+    )
+    while len(candidates):
+        new = []
+        for entry in candidates:
+            key = entry.tobytes()
+            if key not in seen:
+                seen.add(key)
+                new.append(entry)
+        if new:
+            values = _objective(scorer.finish(new), objective)
+            pool = best + new
+            pool_values = np.concatenate([best_values, values])
+            order = np.argsort(-pool_values, kind="stable")[:beam]
+            best = [pool[i] for i in order]
+            best_values = pool_values[order]
+        if time.perf_counter() - start >= time_limit:
+            break
+        # Mostly small changes to the best entries so far, plus some new ones
+        n_samples = batch_size // 4
+        candidates = [
+            mutate(best[rng.integers(len(best))], parents, children, n_teams, rng)
+            for _ in range(batch_size - n_samples)
+        ]
+        candidates = np.concatenate(
+            [candidates, sample_entries(probs, rounds, n_samples, rng)]
+        )
+    return best
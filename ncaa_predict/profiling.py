@@ -0,0 +1,196 @@
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+
+# Lightweight per-stage instrumentation. Stages are timed with stage() or
+# @timed and nest, so a stage's name is the path of stages it ran inside (like
+# "load_data_multiyear/load_data/build_teams"). Nothing is recorded unless
+# enable() was called, so the loaders can be instrumented unconditionally.
+
+# Stages like game_features run once per batch, so only keep this many
+# individual records for each stage name (totals include every call)
+MAX_RECORDS_PER_STAGE = 100
+
+ENABLED = False
+_started = None
+# Records for the stages currently running in each thread, innermost last
+_local = threading.local()
+# Records for finished stages
+_records = []
+# Stage name -> {"calls", "wall_s", "cpu_s"}
+_totals = {}
+
+
+def enable():
+    global ENABLED, _started
+    ENABLED = True
+    _started = time.perf_counter()
+    del _records[:]
+    _totals.clear()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _add(record):
+    total = _totals.setdefault(
+        record["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0}
+    )
+    total["calls"] += 1
+    total["wall_s"] += record["wall_s"]
+    total["cpu_s"] += record["cpu_s"]
+    if total["calls"] <= MAX_RECORDS_PER_STAGE:
+        _records.append(record)
+
+
+# Peak resident memory of this process so far, in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+# Current resident memory in MB, or None where /proc isn't available
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+
+
+@contextlib.contextmanager
+def stage(name, **info):
+    if not ENABLED:
+        yield
+        return
+    stack = _stack()
+    if stack:
+        name = "%s/%s" % (stack[-1]["name"], name)
+    record = {
+        "name": name,
+        "pid": os.getpid(),
+        "start_s": time.perf_counter() - _started,
+        "info": info,
+        "arrays": {},
+    }
+    stack.append(record)
+    start_rss = rss_mb()
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["wall_s"] = time.perf_counter() - start
+        record["cpu_s"] = time.process_time() - start_cpu
+        end_rss = rss_mb()
+        record["rss_delta_mb"] = (
+            None if start_rss is None or end_rss is None else end_rss - start_rss
+        )
+        record["peak_rss_mb"] = peak_rss_mb()
+        stack.pop()
+        _add(record)
+
+
+# Decorator that runs the function as a stage named after it
+def timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+# Adds extra information (like whether a cache entry was used) to the current
+# stage
+def annotate(**info):
+    if ENABLED and _stack():
+        _stack()[-1]["info"].update(info)
+
+
+# Records the size in bytes of arrays produced by the current stage
+def record_arrays(**arrays):
+    if ENABLED and _stack():
+        _stack()[-1]["arrays"].update(
+            (name, int(array.nbytes)) for name, array in arrays.items()
+        )
+
+
+# Runs func(*args) in a multiprocessing worker and returns (result, records)
+# so the stages it ran can be sent back to the parent. Use as
+# pool.map(functools.partial(collect, func), ...) and pass the results to
+# gather().
+def collect(func, *args):
+    if not ENABLED:
+        return func(*args), []
+    # Workers are reused for several calls, so only send back the new ones
+    del _records[:]
+    _totals.clear()
+    result = func(*args)
+    return result, list(_records)
+
+
+def gather(results):
+    data = []
+    for result, records in results:
+        for record in records:
+            _add(record)
+        data.append(result)
+    return data
+
+
+def report():
+    return {
+        "command": sys.argv,
+        "wall_s": time.perf_counter() - _started,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": sorted(_records, key=lambda record: record["start_s"]),
+        "totals": _totals,
+    }
+
+
+def write_report(path):
+    data = json.dumps(report(), indent=2)
+    if path == "-":
+        sys.stderr.write(data + "\n")
+    else:
+        with open(path, "w") as f:
+            f.write(data + "\n")
+        print("Wrote profile to %s" % path)
+
+
+def add_argument(parser):
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="FILE",
+        help="Write a JSON report of the time and memory used by each stage to "
+        "FILE, or to stderr if no file is given.",
+    )
+
+
+# Profiles the body of the with block if path isn't None, and writes the
+# report to path when it finishes (even if it failed)
+@contextlib.contextmanager
+def profile(path):
+    if path is None:
+        yield
+        return
+    enable()
+    try:
+        yield
+    finally:
+        write_report(path)
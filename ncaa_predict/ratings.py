@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from ncaa_predict import cache
+from ncaa_predict.data_loader import data_path, games_csv, load_ncaa_games
+
+
+# Bump this when compute_ratings() changes, so cached ratings get rebuilt
+RATINGS_VERSION = 1
+RATINGS_SCHEMA = {"version": RATINGS_VERSION}
+
+
+# Returns a DataFrame indexed by school_id with each team's mean score and its
+# adjustment, which is the mean over its opponents of how many fewer points
+# they scored against this team than they did on average. Teams with no games
+# against known opponents have a NaN adjustment.
+def compute_ratings(games):
+    scores = games.groupby("school_id")["score"].mean()
+    matchups = games.groupby(["school_id", "opponent_id"])["score"].mean().reset_index()
+    matchups = matchups[matchups["school_id"] != matchups["opponent_id"]]
+    matchups["diff"] = (
+        scores.reindex(matchups["school_id"]).values - matchups["score"].values
+    )
+    adjustments = matchups.groupby("opponent_id")["diff"].mean()
+    ratings = pd.DataFrame({"score": scores, "adjustment": adjustments})
+    ratings.index = ratings.index.astype(np.int64)
+    ratings.index.name = "school_id"
+    return ratings
+
+
+def _build_ratings(year):
+    ratings = compute_ratings(load_ncaa_games(year))
+    return ratings.index.values, ratings[["score", "adjustment"]].values
+
+
+def load_ratings(year):
+    school_ids, values = cache.cached_arrays(
+        "ratings_%s" % year,
+        ["school_ids", "ratings"],
+        [data_path(games_csv(year))],
+        RATINGS_SCHEMA,
+        lambda: _build_ratings(year),
+    )
+    return pd.DataFrame(
+        np.array(values),
+        index=pd.Index(np.array(school_ids), name="school_id"),
+        columns=["score", "adjustment"],
+    )
+
+
+# Returns the predicted (a_scores, b_scores) for each pair of teams in the
+# equal-length a_ids and b_ids
+def predict_scores(ratings, a_ids, b_ids):
+    a = ratings.reindex(a_ids)
+    b = ratings.reindex(b_ids)
+    a_scores = a["score"].values - b["adjustment"].values
+    b_scores = b["score"].values - a["adjustment"].values
+    return a_scores, b_scores
@@ -0,0 +1,228 @@
+import collections
+import http.server
+import json
+import queue
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from ncaa_predict.bracket import bracket_results, bracket_teams, predict_bracket
+from ncaa_predict.util import team_names_to_ids
+
+
+DEFAULT_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 10000
+N_LATENCIES = 10000
+
+
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.games = 0
+        self.latencies = collections.deque(maxlen=N_LATENCIES)
+
+    def record_request(self, latency, error=False):
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+            self.latencies.append(latency)
+
+    def record_batch(self, n_games):
+        with self.lock:
+            self.batches += 1
+            self.games += n_games
+
+    def report(self):
+        with self.lock:
+            uptime = time.time() - self.started
+            latencies = np.array(self.latencies) * 1000
+            report = {
+                "uptime_s": uptime,
+                "requests": self.requests,
+                "errors": self.errors,
+                "requests_per_s": self.requests / uptime,
+                "batches": self.batches,
+                "games": self.games,
+                "games_per_s": self.games / uptime,
+                "mean_batch_size": self.games / self.batches if self.batches else 0,
+            }
+            if len(latencies):
+                for percentile in (50, 90, 99):
+                    report["latency_p%s_ms" % percentile] = np.percentile(
+                        latencies, percentile
+                    )
+            return report
+
+
+# A win probability source that merges calls arriving within `window` seconds
+# of each other (up to max_batch games) into a single call to win_probability
+class MicroBatcher:
+    def __init__(
+        self,
+        win_probability,
+        stats,
+        window=DEFAULT_WINDOW,
+        max_batch=DEFAULT_MAX_BATCH,
+    ):
+        self.win_probability = win_probability
+        self.stats = stats
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def __call__(self, a_ids, b_ids):
+        item = {"a_ids": list(a_ids), "b_ids": list(b_ids), "done": threading.Event()}
+        self.queue.put(item)
+        item["done"].wait()
+        if "error" in item:
+            raise item["error"]
+        return item["result"]
+
+    def _next_batch(self):
+        items = [self.queue.get()]
+        n_games = len(items[0]["a_ids"])
+        deadline = time.monotonic() + self.window
+        while n_games < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            n_games += len(item["a_ids"])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._next_batch()
+            a_ids = [school_id for item in items for school_id in item["a_ids"]]
+            b_ids = [school_id for item in items for school_id in item["b_ids"]]
+            try:
+                probs = self.win_probability(a_ids, b_ids)
+            except Exception as e:
+                for item in items:
+                    item["error"] = e
+                    item["done"].set()
+                continue
+            self.stats.record_batch(len(a_ids))
+            start = 0
+            for item in items:
+                end = start + len(item["a_ids"])
+                item["result"] = probs[start:end]
+                item["done"].set()
+                start = end
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _to_bracket(value):
+    if isinstance(value, list):
+        if len(value) != 2:
+            raise BadRequest("Each game in a bracket must have two sides")
+        return tuple(_to_bracket(side) for side in value)
+    return value
+
+
+# Returns a request handler class answering:
+#   GET /matchup?a=NAME&b=NAME[&year=YEAR][&model=NAME]
+#   POST /bracket with {"bracket": [[a, b], [c, d]], "year": ..., "model": ...}
+#   GET /stats
+# batchers maps (model name, year) to a MicroBatcher, and team_ids maps year to
+# the set of school IDs that have players
+def make_handler(batchers, team_ids, school_index, stats, default_model, default_year):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def _source(self, params):
+            model = params.get("model", default_model)
+            year = int(params.get("year", default_year))
+            if (model, year) not in batchers:
+                raise BadRequest("No model [%s] loaded for %s" % (model, year))
+            return batchers[model, year], team_ids[year]
+
+        def _check_teams(self, names, year_team_ids):
+            try:
+                ids = team_names_to_ids(names, school_index)
+            except Exception as e:
+                raise BadRequest(str(e))
+            missing = [
+                name
+                for name, school_id in zip(names, ids)
+                if school_id not in year_team_ids
+            ]
+            if missing:
+                raise BadRequest(
+                    "No player data for %s"
+                    % ", ".join("[%s]" % name for name in missing)
+                )
+            return ids
+
+        def _matchup(self, params):
+            source, year_team_ids = self._source(params)
+            a_id, b_id = self._check_teams([params["a"], params["b"]], year_team_ids)
+            (p,) = source([a_id], [b_id])
+            return {"team_a": params["a"], "team_b": params["b"], "p_a": float(p)}
+
+        def _bracket(self, body):
+            params = json.loads(body)
+            if not isinstance(params, dict):
+                raise BadRequest("Expected a JSON object")
+            source, year_team_ids = self._source(params)
+            bracket = _to_bracket(params["bracket"])
+            self._check_teams(bracket_teams(bracket), year_team_ids)
+            results = predict_bracket(source, school_index, bracket)
+            return {
+                "winner": results[()][2],
+                "games": [
+                    {"team_a": a, "team_b": b, "winner": winner, "p": float(p)}
+                    for a, b, winner, p in bracket_results(bracket, results)
+                ],
+            }
+
+        def _respond(self, handler, params, record=True):
+            start = time.perf_counter()
+            try:
+                status, body = 200, handler(params)
+            except (BadRequest, KeyError, TypeError, ValueError) as e:
+                status, body = 400, {"error": str(e)}
+            if record:
+                stats.record_request(time.perf_counter() - start, status != 200)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            if url.path == "/matchup":
+                self._respond(self._matchup, params)
+            elif url.path == "/stats":
+                self._respond(lambda _: stats.report(), params, record=False)
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            url = urllib.parse.urlparse(self.path)
+            if url.path != "/bracket":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            self._respond(self._bracket, self.rfile.read(length))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
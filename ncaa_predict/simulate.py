@@ -0,0 +1,119 @@
+import functools
+import multiprocessing
+
+import numpy as np
+
+from ncaa_predict.bracket import bracket_teams, games_by_round
+from ncaa_predict.util import team_names_to_ids
+
+
+# Tournaments simulated at once in each worker. Memory use is about
+# 2 * CHUNK_SIZE * (number of teams + number of games) bytes.
+CHUNK_SIZE = 100000
+
+
+# Numbers the teams in bracket (in bracket_teams() order) and then the games,
+# and returns the games in each round as (game_slots, left_slots, right_slots)
+# arrays, where left and right are the numbers of the teams or games whose
+# winners play in each game
+def bracket_slots(bracket):
+    rounds = []
+    games_by_round(bracket, rounds)
+    slots = {}
+
+    def number_teams(side, path):
+        if isinstance(side, tuple):
+            for i, child in enumerate(side):
+                number_teams(child, path + (i,))
+        else:
+            slots[path] = len(slots)
+
+    number_teams(bracket, ())
+    for games in rounds:
+        for path, _ in games:
+            slots[path] = len(slots)
+
+    slot_rounds = []
+    for games in rounds:
+        paths = [path for path, _ in games]
+        slot_rounds.append(
+            (
+                np.array([slots[path] for path in paths]),
+                np.array([slots[path + (0,)] for path in paths]),
+                np.array([slots[path + (1,)] for path in paths]),
+            )
+        )
+    return slot_rounds
+
+
+# Returns the [n_teams, n_teams] matrix of the probability that each team
+# beats each other team, from one call to win_probability
+def bracket_win_matrix(win_probability, school_ids):
+    n_teams = len(school_ids)
+    school_ids = np.asarray(school_ids)
+    a_ids = np.repeat(school_ids, n_teams)
+    b_ids = np.tile(school_ids, n_teams)
+    probs = np.asarray(win_probability(a_ids, b_ids), dtype=np.float32)
+    return probs.reshape([n_teams, n_teams])
+
+
+# Simulates n tournaments with the random generator rng, and returns the
+# [n_teams + n_games, n] array of the winner of every slot (see
+# bracket_slots()) in each tournament. Every tournament is simulated at once,
+# a round at a time.
+def simulate_winners(probs, rounds, n, rng):
+    n_teams = len(probs)
+    n_slots = n_teams + sum(len(games) for games, _, _ in rounds)
+    winners = np.empty([n_slots, n], dtype=np.int16)
+    winners[:n_teams] = np.arange(n_teams, dtype=np.int16)[:, None]
+    for games, left, right in rounds:
+        a = winners[left]
+        b = winners[right]
+        if left.max() < n_teams and right.max() < n_teams:
+            # Games between teams (not winners of earlier games) are the same
+            # matchup in every tournament
+            p = probs[left, right][:, None]
+        else:
+            p = probs[a, b]
+        a_wins = rng.random(a.shape, dtype=np.float32) < p
+        winners[games] = np.where(a_wins, a, b)
+    return winners
+
+
+# Returns how many times each team won a game in each round of n simulated
+# tournaments, as an [n_rounds, n_teams] array
+def _simulate_chunk(probs, rounds, n, seed):
+    winners = simulate_winners(probs, rounds, n, np.random.default_rng(seed))
+    wins = np.zeros([len(rounds), len(probs)], dtype=np.int64)
+    for i, (games, _, _) in enumerate(rounds):
+        wins[i] = np.bincount(winners[games].ravel(), minlength=len(probs))
+    return wins
+
+
+# Simulates n_sims tournaments with probs from bracket_win_matrix() and
+# returns an [n_rounds, n_teams] array of the probability of each team winning
+# a game in each round (so the last row is the probability of winning the
+# tournament). The tournaments are split into chunks of chunk_size, each with
+# its own random stream spawned from seed, which are simulated by `jobs`
+# processes, so the results for a seed don't depend on jobs.
+def simulate(probs, rounds, n_sims, seed=None, jobs=1, chunk_size=CHUNK_SIZE):
+    sizes = [min(chunk_size, n_sims - start) for start in range(0, n_sims, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    simulate_chunk = functools.partial(_simulate_chunk, probs, rounds)
+    if jobs == 1:
+        wins = list(map(simulate_chunk, sizes, seeds))
+    else:
+        # The model (and so TensorFlow) may already be loaded, so don't fork
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(jobs) as p:
+            wins = p.starmap(simulate_chunk, zip(sizes, seeds))
+    return np.sum(wins, axis=0) / n_sims
+
+
+# Returns (names, probabilities), where names are the teams in bracket and
+# probabilities is simulate()'s array for them
+def simulate_bracket(win_probability, school_index, bracket, n_sims, seed=None, jobs=1):
+    names = bracket_teams(bracket)
+    school_ids = team_names_to_ids(names, school_index)
+    probs = bracket_win_matrix(win_probability, school_ids)
+    return names, simulate(probs, bracket_slots(bracket), n_sims, seed, jobs)
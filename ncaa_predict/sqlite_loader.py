@@ -0,0 +1,104 @@
+import contextlib
+import os
+import sqlite3
+
+import pandas as pd
+
+from ncaa_predict.data_loader import (
+    GAME_COLUMNS,
+    data_path,
+    games_csv,
+    load_csv,
+    players_csv,
+    prepare_players,
+)
+
+
+# Alternatives to the loaders in data_loader that query an SQLite database
+# built by import_csvs() instead of parsing whole CSVs, so loading a few teams
+# or a single year only reads the rows needed. Rows come back in CSV order so
+# the results match the CSV loaders exactly.
+
+DEFAULT_DB = "ncaa.sqlite"
+
+INDEXES = [
+    ("games", ["year", "school_id"]),
+    ("games", ["school_id"]),
+    ("games", ["opponent_id"]),
+    ("players", ["year", "school_id"]),
+    ("players", ["school_id"]),
+    ("players", ["player_id"]),
+    ("schools", ["school_id"]),
+]
+
+
+# Opens db, which has to exist unless create is set (otherwise SQLite would
+# silently create an empty database, and queries would fail with "no such
+# table" instead of saying the database is missing)
+def connect(db=DEFAULT_DB, create=False):
+    path = data_path(db)
+    if not create and not os.path.exists(path):
+        raise Exception("Database %s doesn't exist; build it with ./build_db.py" % path)
+    return contextlib.closing(sqlite3.connect(path))
+
+
+def _table_exists(conn, table):
+    query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    return conn.execute(query, [table]).fetchone() is not None
+
+
+def _replace_year(conn, table, year, df):
+    if _table_exists(conn, table):
+        conn.execute("DELETE FROM %s WHERE year = ?" % table, [year])
+    df.to_sql(table, conn, if_exists="append", index=False)
+
+
+def import_csvs(years, db=DEFAULT_DB):
+    with connect(db, create=True) as conn:
+        schools = load_csv("csv/ncaa_schools.csv")
+        schools.to_sql("schools", conn, if_exists="replace", index=False)
+        for year in years:
+            print("Importing %s" % year)
+            _replace_year(conn, "games", year, load_csv(games_csv(year)))
+            _replace_year(conn, "players", year, load_csv(players_csv(year)))
+        for table, columns in INDEXES:
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)"
+                % (table, "_".join(columns), table, ", ".join(columns))
+            )
+        conn.commit()
+
+
+def _query(db, sql, params):
+    with connect(db) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def _school_filter(school_ids):
+    if school_ids is None:
+        return "", []
+    school_ids = [int(school_id) for school_id in school_ids]
+    return (
+        " AND school_id IN (%s)" % ", ".join("?" * len(school_ids)),
+        school_ids,
+    )
+
+
+def load_ncaa_games(year, school_ids=None, db=DEFAULT_DB):
+    where, params = _school_filter(school_ids)
+    sql = "SELECT %s FROM games WHERE year = ?%s ORDER BY rowid" % (
+        ", ".join(GAME_COLUMNS),
+        where,
+    )
+    return _query(db, sql, [year] + params).dropna()
+
+
+def load_ncaa_players(year, school_ids=None, db=DEFAULT_DB):
+    where, params = _school_filter(school_ids)
+    sql = "SELECT * FROM players WHERE year = ?%s ORDER BY rowid" % where
+    return prepare_players(_query(db, sql, [year] + params))
+
+
+def load_ncaa_schools(db=DEFAULT_DB):
+    sql = "SELECT school_id, school_name FROM schools ORDER BY rowid"
+    return _query(db, sql, [])
@@ -0,0 +1,185 @@
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from ncaa_predict.data_loader import shared_array
+from ncaa_predict.models import (
+    DEFAULT_HIDDEN_LAYERS,
+    DEFAULT_OPTIMIZER,
+    DEFAULT_REGULARIZER,
+    build_model,
+)
+from ncaa_predict.util import limit_tensorflow_threads
+
+
+# Values tried for each parameter when no spec file is given. A spec file is a
+# JSON object with the same keys (any that are left out use DEFAULTS).
+DEFAULT_SPEC = {
+    "hidden_layers": [[16], [64], [64, 16]],
+    "regularizer": ["L1L2", None],
+    "optimizer": ["rmsprop", "adam"],
+    "batch_size": [1000, 10000],
+}
+DEFAULTS = {
+    "hidden_layers": DEFAULT_HIDDEN_LAYERS,
+    "regularizer": DEFAULT_REGULARIZER,
+    "optimizer": DEFAULT_OPTIMIZER,
+    "batch_size": 10000,
+}
+# Trials are compared, stopped and checkpointed on the validation loss without
+# the regularization penalty, so trials with different regularizers compare
+# fairly
+MONITOR = "val_categorical_crossentropy"
+
+
+def load_spec(path):
+    with open(path) as f:
+        spec = json.load(f)
+    unknown = sorted(set(spec) - set(DEFAULTS))
+    if unknown:
+        raise Exception("Unknown sweep parameters: %s" % ", ".join(unknown))
+    return {name: spec.get(name, [default]) for name, default in DEFAULTS.items()}
+
+
+# Returns a dict of parameters for every combination in spec, or for n_random
+# combinations chosen at random (without repeats)
+def trial_params(spec, n_random=None, seed=0):
+    names = sorted(spec)
+    grid = [
+        dict(zip(names, values))
+        for values in itertools.product(*(spec[name] for name in names))
+    ]
+    if n_random is not None and n_random < len(grid):
+        rng = np.random.default_rng(seed)
+        grid = [grid[i] for i in sorted(rng.choice(len(grid), n_random, replace=False))]
+    return grid
+
+
+def trial_model_path(out_dir, index):
+    return os.path.join(out_dir, "trial_%03d.keras" % index)
+
+
+# The sweep's data and settings, set in each worker. Workers are forked, so the
+# arrays are inherited instead of copied.
+_state = None
+
+
+def _set_state(state, threads):
+    global _state
+    _state = state
+    limit_tensorflow_threads(threads)
+
+
+def _run_trial(task):
+    index, params = task
+    import keras
+
+    from ncaa_predict.dataset import ArraySequence
+
+    state = _state
+    losses = state["losses"]
+    start = time.perf_counter()
+    model = build_model(
+        params["hidden_layers"], params["regularizer"], params["optimizer"]
+    )
+    stopped = []
+
+    # Median stopping rule: after min_epochs, stop if this trial's best loss so
+    # far is worse than the median loss of the other trials at the same epoch
+    def on_epoch_end(epoch, logs):
+        losses[index, epoch] = logs[MONITOR]
+        if epoch + 1 < state["min_epochs"]:
+            return
+        others = np.delete(losses[:, epoch], index)
+        others = others[~np.isnan(others)]
+        best = np.nanmin(losses[index, : epoch + 1])
+        if len(others) >= state["min_trials"] and best > np.median(others):
+            model.stop_training = True
+            stopped.append(epoch + 1)
+
+    features, labels, rows = state["train"]
+    batch_size = params["batch_size"]
+    history = model.fit(
+        ArraySequence(
+            features,
+            labels,
+            rows,
+            batch_size,
+            shuffle=True,
+            seed=index,
+            mirror=state["mirror"],
+        ),
+        validation_data=ArraySequence(*state["validation"], batch_size),
+        epochs=state["epochs"],
+        verbose=0,
+        callbacks=[
+            keras.callbacks.ModelCheckpoint(
+                trial_model_path(state["out_dir"], index),
+                monitor=MONITOR,
+                mode="min",
+                save_best_only=True,
+            ),
+            keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end),
+        ],
+    ).history
+    best_epoch = int(np.argmin(history[MONITOR]))
+    return {
+        "trial": index,
+        "hidden_layers": ",".join(map(str, params["hidden_layers"])),
+        "regularizer": params["regularizer"] or "none",
+        "optimizer": params["optimizer"],
+        "batch_size": batch_size,
+        "epochs": len(history[MONITOR]),
+        "stopped_early": bool(stopped),
+        "best_epoch": best_epoch + 1,
+        "log_loss": history[MONITOR][best_epoch],
+        "accuracy": history["val_accuracy"][best_epoch],
+        "auc": history["val_AUC"][best_epoch],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# Trains a model for each of params (from trial_params()) in `jobs` worker
+# processes, and yields a result dict for each as it finishes. train and
+# validation are (features, labels, rows) triples, where rows are the rows of
+# the arrays to use; the arrays should be in shared memory (like
+# load_data_multiyear()'s) or memory-mapped, since every worker reads them.
+# Each trial's best epoch is saved with trial_model_path(). Trials that fall
+# behind the others are stopped early unless min_trials is None. With mirror,
+# training games are seen from both teams' perspectives (see ArraySequence).
+def sweep(
+    params,
+    train,
+    validation,
+    out_dir,
+    epochs,
+    jobs=None,
+    min_epochs=2,
+    min_trials=3,
+    mirror=True,
+):
+    jobs = min(jobs or os.cpu_count(), len(params))
+    # Validation loss of each trial after each epoch (NaN until it's reached)
+    losses = shared_array([len(params), epochs], np.float64)
+    losses[:] = np.nan
+    state = {
+        "train": train,
+        "validation": validation,
+        "out_dir": out_dir,
+        "epochs": epochs,
+        "min_epochs": min_epochs,
+        "min_trials": len(params) if min_trials is None else min_trials,
+        "losses": losses,
+        "mirror": mirror,
+    }
+    threads = max(1, os.cpu_count() // jobs)
+    # Workers need to inherit the shared arrays. This is only safe because
+    # TensorFlow isn't imported until the workers start.
+    context = multiprocessing.get_context("fork")
+    with context.Pool(jobs, initializer=_set_state, initargs=(state, threads)) as p:
+        for result in p.imap_unordered(_run_trial, enumerate(params)):
+            yield result
@@ -1,3 +1,6 @@
+import re
+
+
 def list_arg(type=str, sep=",", container=list):
     def convert_arg(v):
         return container(map(type, v.split(sep)))
@@ -5,8 +8,91 @@ def list_arg(type=str, sep=",", container=list):
     return convert_arg
 
 
-def team_name_to_id(name, all_teams):
-    try:
-        return all_teams[all_teams["school_name"] == name]["school_id"].values[0]
-    except IndexError:
-        raise Exception("Couldn't find ID for school [%s]" % name)
+# Limits the threads TensorFlow uses in this process, for worker processes
+# that share the machine with others. Has to be called before TensorFlow runs
+# anything.
+def limit_tensorflow_threads(threads):
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+
+# Other common names for schools, mapped to their name in ncaa_schools.csv
+SCHOOL_ALIASES = {
+    "Brigham Young": "BYU",
+    "Central Florida": "UCF",
+    "Connecticut": "UConn",
+    "East Tennessee St.": "ETSU",
+    "Florida Gulf Coast": "FGCU",
+    "Louisiana St.": "LSU",
+    "Miami": "Miami (FL)",
+    "Middle Tennessee": "Middle Tenn.",
+    "Mississippi": "Ole Miss",
+    "NC State": "North Carolina St.",
+    "Nevada-Las Vegas": "UNLV",
+    "Northern Kentucky": "Northern Ky.",
+    "Pitt": "Pittsburgh",
+    "Saint Mary's": "Saint Mary's (CA)",
+    "Southern Methodist": "SMU",
+    "St. John's": "St. John's (NY)",
+    "UNC Wilmington": "UNCW",
+    "USC": "Southern California",
+    "Virginia Commonwealth": "VCU",
+}
+
+_NAME_WORDS = {"state": "st", "saint": "st", "mount": "mt"}
+
+
+# Case folds the name, drops punctuation and spells common words the same way,
+# so "Mount St. Mary's" and "Mt. Saint Marys" are both "mt st marys"
+def normalize_school_name(name):
+    words = re.sub(r"[^\w&]+", " ", name.replace("'", "").casefold()).split()
+    return " ".join(_NAME_WORDS.get(word, word) for word in words)
+
+
+# Returns (exact, normalized) dicts mapping school names to IDs. Normalized
+# names that could mean more than one school are left out.
+def build_school_index(all_teams):
+    exact = {}
+    for name, school_id in zip(all_teams["school_name"], all_teams["school_id"]):
+        exact.setdefault(name, school_id)
+
+    normalized = {}
+    ambiguous = set()
+    for name, school_id in exact.items():
+        key = normalize_school_name(name)
+        if normalized.get(key, school_id) != school_id:
+            ambiguous.add(key)
+        normalized[key] = school_id
+    for key in ambiguous:
+        del normalized[key]
+
+    for alias, name in SCHOOL_ALIASES.items():
+        # The schools table may not have every school (like synthetic data)
+        if name in exact:
+            normalized.setdefault(normalize_school_name(alias), exact[name])
+    return exact, normalized
+
+
+def _lookup_school(name, school_index):
+    exact, normalized = school_index
+    school_id = exact.get(name)
+    if school_id is None:
+        school_id = normalized.get(normalize_school_name(name))
+    return school_id
+
+
+def team_name_to_id(name, school_index):
+    return team_names_to_ids([name], school_index)[0]
+
+
+def team_names_to_ids(names, school_index):
+    ids = [_lookup_school(name, school_index) for name in names]
+    missing = [name for name, school_id in zip(names, ids) if school_id is None]
+    if missing:
+        raise Exception(
+            "Couldn't find IDs for schools %s"
+            % ", ".join("[%s]" % name for name in missing)
+        )
+    return ids
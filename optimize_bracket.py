@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+import argparse
+
+import numpy as np
+
+from ncaa_predict import profiling
+from ncaa_predict.bracket import bracket_results, bracket_teams, games_by_round
+from ncaa_predict.data_loader import load_ncaa_schools, load_teams
+from ncaa_predict.matchups import (
+    load_win_matrix,
+    matrix_win_probability,
+    model_win_probability,
+)
+from ncaa_predict.models import load_model
+from ncaa_predict.pool import (
+    DEFAULT_POINTS,
+    OBJECTIVES,
+    PoolScorer,
+    favorite_entry,
+    optimize,
+)
+from ncaa_predict.simulate import bracket_slots, bracket_win_matrix
+from ncaa_predict.util import build_school_index, team_names_to_ids
+from predict import BRACKET
+
+
+DESCRIPTION = (
+    "Pick the entry for BRACKET with the best chance of winning a bracket pool, "
+    "by scoring candidate entries against simulated tournaments and opponents."
+)
+
+
+# Returns a predict_bracket()-style dict of each game's (team_a, team_b,
+# winner, p) for entry, where p is the probability of the pick winning
+def entry_results(bracket, names, probs, rounds, entry):
+    paths = []
+    games_by_round(bracket, paths)
+    paths = [path for games in paths for path, _ in games]
+    picks = np.concatenate([np.arange(len(names)), entry])
+    results = {}
+    for games, left, right in rounds:
+        for game, a, b in zip(games, picks[left], picks[right]):
+            winner = picks[game]
+            loser = b if winner == a else a
+            results[paths[game - len(names)]] = (
+                names[a],
+                names[b],
+                names[winner],
+                probs[winner, loser],
+            )
+    return results
+
+
+def add_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model-in", "-m")
+    source.add_argument(
+        "--win-matrix",
+        "-p",
+        help="Look up win probabilities in a matrix from ./build_win_matrix.py "
+        "instead of running a model.",
+    )
+    parser.add_argument("--year", "-y", default=2017, type=int)
+    parser.add_argument(
+        "--points",
+        default=DEFAULT_POINTS,
+        type=lambda s: [int(points) for points in s.split(",")],
+        help="Comma-separated points for a correct pick in each round. "
+        "(default: %s)" % ",".join(map(str, DEFAULT_POINTS)),
+    )
+    parser.add_argument(
+        "--upset-bonus",
+        default=0,
+        type=int,
+        help="Extra points for correctly picking a team with less than a 50%% "
+        "chance of winning a game. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pool-size",
+        default=100,
+        type=int,
+        help="The number of entries in the pool, including this one. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--simulations",
+        default=10000,
+        type=int,
+        help="The number of tournaments to score entries against. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--opponents",
+        default=1000,
+        type=int,
+        help="The number of opponent entries to sample; each simulated pool "
+        "draws its opponents from these. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chalk",
+        default=1.0,
+        type=float,
+        help="How much more than the model opponents pick favourites: 1 picks "
+        "like the model, higher picks more favourites and lower picks more "
+        "upsets. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--objective",
+        default="win",
+        choices=OBJECTIVES,
+        help="Maximize the chance of winning the pool, or minimize the expected "
+        "finishing place. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--time-limit",
+        default=60,
+        type=float,
+        help="Seconds to spend searching. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--beam",
+        default=16,
+        type=int,
+        help="The number of best entries to keep changing while searching. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        default=None,
+        type=int,
+        help="Random seed. (default: different every time)",
+    )
+    profiling.add_argument(parser)
+
+
+def main(args):
+    with profiling.profile(args.profile):
+        school_index = build_school_index(load_ncaa_schools())
+        if args.win_matrix is not None:
+            win_probability = matrix_win_probability(*load_win_matrix(args.win_matrix))
+        else:
+            team_ids, teams = load_teams(args.year)
+            with profiling.stage("load_model"):
+                model = load_model(args.model_in)
+            win_probability = model_win_probability(model, team_ids, teams)
+        names = bracket_teams(BRACKET)
+        probs = bracket_win_matrix(
+            win_probability, team_names_to_ids(names, school_index)
+        )
+        rounds = bracket_slots(BRACKET)
+        rng = np.random.default_rng(args.seed)
+
+        def scorer():
+            return PoolScorer(
+                probs,
+                rounds,
+                args.points,
+                args.upset_bonus,
+                args.pool_size,
+                args.simulations,
+                args.opponents,
+                args.chalk,
+                rng,
+            )
+
+        with profiling.stage("search"):
+            best = optimize(
+                scorer(),
+                probs,
+                rounds,
+                rng,
+                args.objective,
+                args.time_limit,
+                args.beam,
+            )
+        # The search favours entries that got lucky in its simulations, so
+        # pick from the best ones on tournaments it hasn't seen
+        with profiling.stage("rescore"):
+            candidates = [favorite_entry(probs, rounds)] + best
+            scores, wins, win_errors, places = scorer().finish(candidates)
+            values = wins if args.objective == "win" else -places
+            pick = int(np.argmax(values))
+
+    results = entry_results(BRACKET, names, probs, rounds, candidates[pick])
+    for team_a, team_b, winner, p in bracket_results(BRACKET, results):
+        print("%s vs %s: %s wins (p=%.2f)" % (team_a, team_b, winner, p))
+    print()
+    for label, i in [("Picking favourites", 0), ("This entry", pick)]:
+        print(
+            "%s: expected score %.1f, wins the pool %.1f%% (+/- %.1f%%) of the "
+            "time, expected place %.1f of %s"
+            % (
+                label,
+                scores[i],
+                100 * wins[i],
+                100 * win_errors[i],
+                places[i],
+                args.pool_size,
+            )
+        )
+    if pick == 0:
+        print("Picking favourites did best")
+    elif args.objective == "win" and wins[pick] - wins[0] < 2 * np.hypot(
+        win_errors[pick], win_errors[0]
+    ):
+        print(
+            "The difference in winning chances is within the simulation noise; "
+            "try more --simulations"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
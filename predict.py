@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 import argparse
 
-import keras
 import numpy as np
 
-from ncaa_predict.data_loader import (
-    load_ncaa_players,
-    load_ncaa_schools,
-    get_players_for_team,
+from ncaa_predict import profiling, sqlite_loader
+from ncaa_predict.bracket import bracket_results, bracket_teams, predict_bracket
+from ncaa_predict.data_loader import build_teams, load_teams, load_ncaa_schools
+from ncaa_predict.ensemble import load_models
+from ncaa_predict.matchups import (
+    load_win_matrix,
+    matrix_win_probability,
+    model_win_probability,
 )
-from ncaa_predict.util import list_arg, team_name_to_id
+from ncaa_predict.simulate import simulate_bracket
+from ncaa_predict.util import build_school_index, list_arg, team_names_to_ids
 
 
+DESCRIPTION = "Predict the winner of every game in BRACKET."
+
 BRACKET = (
     (
         (
@@ -112,43 +118,135 @@ BRACKET = (
 )
 
 
-def predict(model, all_teams, all_players, bracket, wait=False):
-    team_a, team_b = bracket
-    if isinstance(team_a, tuple):
-        team_a = predict(model, all_teams, all_players, team_a, wait)
-    if isinstance(team_b, tuple):
-        team_b = predict(model, all_teams, all_players, team_b, wait)
-    teams = [team_a, team_b]
-    team_ids = [team_name_to_id(name, all_teams) for name in teams]
-    players_a = get_players_for_team(all_players, team_ids[0])
-    players_b = get_players_for_team(all_players, team_ids[1])
-    x = np.array([np.stack([players_a, players_b])])
-    a_wins, b_wins = model.predict(x=x)[0]
-    if a_wins > b_wins:
-        winner = team_a
-    else:
-        winner = team_b
-    print("%s vs %s: %s wins (p=%.2f)" % (team_a, team_b, winner, max(a_wins, b_wins)))
-    if wait:
-        input()
-    return winner
+def predict(win_probability, school_index, bracket, wait=False):
+    results = predict_bracket(win_probability, school_index, bracket)
+    for team_a, team_b, winner, p in bracket_results(bracket, results):
+        print("%s vs %s: %s wins (p=%.2f)" % (team_a, team_b, winner, p))
+        if wait:
+            input()
+    return results[()][2]
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--model-in", "-m", required=True)
+# Prints each team's probability of reaching each round (after the first) and
+# of winning, most likely winners first
+def print_simulation(names, probabilities):
+    n_rounds = len(probabilities)
+    width = max(len(name) for name in names)
+    print(
+        " ".join(
+            ["%-*s" % (width, "Team")]
+            + ["%6s" % ("Rd %d" % (i + 2)) for i in range(n_rounds - 1)]
+            + ["%6s" % "Champ"]
+        )
+    )
+    for team in np.lexsort(probabilities)[::-1]:
+        print(
+            " ".join(
+                ["%-*s" % (width, names[team])]
+                + ["%6.3f" % p for p in probabilities[:, team]]
+            )
+        )
+
+
+def add_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--model-in",
+        "-m",
+        action="append",
+        help="A Keras model, or one exported by ./export_model.py. Repeat to "
+        "average several models' predictions.",
+    )
+    source.add_argument(
+        "--win-matrix",
+        "-p",
+        help="Look up win probabilities in a matrix from ./build_win_matrix.py "
+        "instead of running a model.",
+    )
     parser.add_argument("--year", "-y", default=2017, type=int)
+    parser.add_argument(
+        "--weights",
+        default=None,
+        type=list_arg(float),
+        help="Comma-separated weights for averaging the --model-in models' "
+        "predictions, in the same order. (default: equal weights)",
+    )
     parser.add_argument("--wait", "-w", default=False, action="store_const", const=True)
-    args = parser.parse_args()
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Load only the bracket's teams from an SQLite database made by "
+        "./build_db.py instead of the CSVs.",
+    )
+    parser.add_argument(
+        "--simulate",
+        default=None,
+        type=int,
+        metavar="N",
+        help="Instead of picking the most likely winner of each game, simulate "
+        "N tournaments and print each team's probability of reaching each "
+        "round.",
+    )
+    parser.add_argument(
+        "--seed",
+        default=None,
+        type=int,
+        help="Random seed for --simulate. (default: different every time)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=1,
+        type=int,
+        help="The number of processes to simulate with. (default: %(default)s)",
+    )
+    profiling.add_argument(parser)
 
-    players = load_ncaa_players(args.year)
-    all_teams = load_ncaa_schools()
 
-    model = keras.models.load_model(args.model_in)
-    predict(model, all_teams, players, BRACKET, args.wait)
+def main(args):
+    with profiling.profile(args.profile):
+        if args.db is not None:
+            schools = sqlite_loader.load_ncaa_schools(args.db)
+            school_index = build_school_index(schools)
+        else:
+            school_index = build_school_index(load_ncaa_schools())
+
+        if args.win_matrix is not None:
+            win_matrix = load_win_matrix(args.win_matrix)
+            win_probability = matrix_win_probability(*win_matrix)
+        else:
+            if args.db is not None:
+                field = team_names_to_ids(bracket_teams(BRACKET), school_index)
+                players = sqlite_loader.load_ncaa_players(args.year, field, args.db)
+                team_ids, teams = build_teams(players)
+            else:
+                team_ids, teams = load_teams(args.year)
+            with profiling.stage("load_model"):
+                model = load_models(args.model_in, args.weights)
+            win_probability = model_win_probability(model, team_ids, teams)
+        if args.simulate is not None:
+            with profiling.stage("simulate"):
+                names, probabilities = simulate_bracket(
+                    win_probability,
+                    school_index,
+                    BRACKET,
+                    args.simulate,
+                    args.seed,
+                    args.jobs,
+                )
+            print_simulation(names, probabilities)
+        else:
+            with profiling.stage("predict"):
+                predict(win_probability, school_index, BRACKET, args.wait)
 
     # Workaround for TensorFlow bug:
     # https://github.com/tensorflow/tensorflow/issues/3388
     import gc
 
     gc.collect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
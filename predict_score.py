@@ -4,83 +4,48 @@ import argparse
 import numpy as np
 
 from ncaa_predict.data_loader import (
-    load_ncaa_players,
+    load_teams,
     load_ncaa_schools,
-    load_ncaa_games,
     get_players_for_team,
 )
-from ncaa_predict.estimator import *
-from ncaa_predict.util import list_arg, team_name_to_id
+from ncaa_predict.ratings import compute_ratings, load_ratings, predict_scores
+from ncaa_predict.models import load_model
+from ncaa_predict.util import build_school_index, team_names_to_ids
+
+
+DESCRIPTION = "Predict the final score of a game between two teams."
 
 
 def get_historical_score(team_id, all_games):
-    games = all_games[all_games["school_id"] == team_id]
-    normal_score = games["score"].mean()
-    diffs = []
-    for school_id in all_games["school_id"].unique():
-        if school_id == team_id:
-            continue
-        g = all_games[all_games["school_id"] == school_id]
-        normal = g["score"].mean()
-        against_team = g[g["opponent_id"] == team_id]
-        against_team_score = against_team["score"].mean()
-        if np.isnan(against_team_score):
-            continue
-        diffs.append(normal - against_team_score)
-    return normal_score, np.mean(diffs)
+    ratings = compute_ratings(all_games).reindex([team_id])
+    return ratings["score"].values[0], ratings["adjustment"].values[0]
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+def add_arguments(parser):
     parser.add_argument("team_a")
     parser.add_argument("team_b")
     parser.add_argument(
-        "--hidden-units",
-        "-u",
-        default=DEFAULT_HIDDEN_UNITS,
-        type=list_arg(type=int),
-        help="A comma seperated list of hidden units in each DNN layer.",
-    )
-    parser.add_argument("--model-in", "-m")
-    parser.add_argument(
-        "--model-type",
-        "-t",
-        default=ModelType.dnn_classifier,
-        type=ModelType,
-        choices=list(ModelType),
-    )
-    parser.add_argument(
-        "--n-threads",
-        "-j",
-        default=DEFAULT_N_THREADS,
-        type=int,
-        help="Number of threads to use for some Pandas data-loading "
-        "processes. (default: %(default)s)",
+        "--model-in",
+        "-m",
+        help="A model (Keras or exported by ./export_model.py) that predicts "
+        "both teams' scores from their players. (default: use each team's "
+        "historical scores)",
     )
     parser.add_argument("--year", "-y", default=2017, type=int)
-    args = parser.parse_args()
 
-    tf.logging.set_verbosity(tf.logging.ERROR)
 
-    players = load_ncaa_players(args.year)
-    all_teams = load_ncaa_schools()
-    team_a_id = team_name_to_id(args.team_a, all_teams)
-    team_b_id = team_name_to_id(args.team_b, all_teams)
-    players_a = get_players_for_team(players, team_a_id)
-    players_b = get_players_for_team(players, team_b_id)
+def main(args):
+    school_index = build_school_index(load_ncaa_schools())
+    team_a_id, team_b_id = team_names_to_ids([args.team_a, args.team_b], school_index)
 
     if args.model_in:
+        players = load_teams(args.year)
+        players_a = get_players_for_team(*players, team_a_id)
+        players_b = get_players_for_team(*players, team_b_id)
         features = np.array([np.stack([players_a, players_b])])
 
-        estimator = Estimator(
-            args.model_type,
-            hidden_units=args.hidden_units,
-            model_in=args.model_in,
-            n_threads=args.n_threads,
-            feature_year=args.year,
-        )
-
-        score = next(estimator.predict(x=features))
+        model = load_model(args.model_in)
+        score = model.predict(features, verbose=0)[0]
         print(
             "NN Prediction: %s vs. %s final score: %s"
             % (args.team_a, args.team_b, score)
@@ -92,16 +57,15 @@ if __name__ == "__main__":
         # other teams).
         # Use that to adjust each team's historical mean score to predict how
         # well they'll do against each other.
-        games = load_ncaa_games(args.year - 1)
-        a_score, a_diff = get_historical_score(team_a_id, games)
-        b_score, b_diff = get_historical_score(team_b_id, games)
+        ratings = load_ratings(args.year - 1)
+        (a_score,), (b_score,) = predict_scores(ratings, [team_a_id], [team_b_id])
         print(
             "Historical prediction: %s %.1f to %s %.1f (total: %.1f)"
-            % (
-                args.team_a,
-                a_score - b_diff,
-                args.team_b,
-                b_score - a_diff,
-                a_score + b_score - a_diff - b_diff,
-            )
+            % (args.team_a, a_score, args.team_b, b_score, a_score + b_score)
         )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
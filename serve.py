@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import argparse
+import http.server
+import os
+
+from ncaa_predict.data_loader import load_ncaa_schools, load_teams
+from ncaa_predict.matchups import model_win_probability
+from ncaa_predict.models import load_model
+from ncaa_predict.server import (
+    DEFAULT_MAX_BATCH,
+    DEFAULT_WINDOW,
+    MicroBatcher,
+    ServerStats,
+    make_handler,
+)
+from ncaa_predict.util import build_school_index, list_arg
+
+
+DESCRIPTION = (
+    "Keep models and team data in memory and answer matchup and bracket "
+    "queries over HTTP. Queries that arrive close together are predicted in "
+    "one batch."
+)
+
+DEFAULT_PORT = 8017
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--model-in",
+        "-m",
+        required=True,
+        action="append",
+        help="A model to serve. Can be given more than once; models are named "
+        "by their file name, and the first one is the default.",
+    )
+    parser.add_argument(
+        "--years",
+        "-y",
+        default=[2017],
+        type=list_arg(type=int),
+        help="A comma-separated list of years to load team data for. The first "
+        "one is the default. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port", "-p", default=DEFAULT_PORT, type=int, help="(default: %(default)s)"
+    )
+    parser.add_argument(
+        "--window",
+        default=DEFAULT_WINDOW,
+        type=float,
+        help="Seconds to wait for more queries to batch with the first one. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-batch",
+        default=DEFAULT_MAX_BATCH,
+        type=int,
+        help="The most games to predict in one batch. (default: %(default)s)",
+    )
+
+
+def main(args):
+    school_index = build_school_index(load_ncaa_schools())
+    stats = ServerStats()
+    batchers = {}
+    team_ids = {}
+    for path in args.model_in:
+        model = load_model(path)
+        for year in args.years:
+            year_team_ids, teams = load_teams(year)
+            team_ids[year] = set(year_team_ids)
+            batchers[os.path.basename(path), year] = MicroBatcher(
+                model_win_probability(model, year_team_ids, teams),
+                stats,
+                args.window,
+                args.max_batch,
+            )
+
+    handler = make_handler(
+        batchers,
+        team_ids,
+        school_index,
+        stats,
+        os.path.basename(args.model_in[0]),
+        args.years[0],
+    )
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print("Serving on http://127.0.0.1:%s" % args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from ncaa_predict.data_loader import (
+    VALIDATION_FRACTION,
+    load_data,
+    load_data_multiyear,
+    validation_split,
+)
+from ncaa_predict.sweep import (
+    DEFAULT_SPEC,
+    load_spec,
+    sweep,
+    trial_model_path,
+    trial_params,
+)
+from ncaa_predict.util import list_arg
+
+
+DESCRIPTION = (
+    "Train models with different layer sizes, regularizers, optimizers and "
+    "batch sizes in parallel, and save the one with the best validation loss."
+)
+
+DEFAULT_EPOCHS = 10
+COLUMNS = [
+    "trial",
+    "hidden_layers",
+    "regularizer",
+    "optimizer",
+    "batch_size",
+    "epochs",
+    "stopped_early",
+    "best_epoch",
+    "log_loss",
+    "accuracy",
+    "auc",
+    "seconds",
+]
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--train-years",
+        "-y",
+        required=True,
+        type=list_arg(type=int, container=frozenset),
+        help="A comma-separated list of years to train on.",
+    )
+    parser.add_argument(
+        "--validation-year",
+        "-p",
+        default=None,
+        type=int,
+        help="A year to validate on. (default: %d%%%% of the training games, "
+        "chosen at random)" % (VALIDATION_FRACTION * 100),
+    )
+    parser.add_argument(
+        "--out-dir",
+        "-o",
+        required=True,
+        help="Directory to save each trial's model, results.csv and the best "
+        "model (best.keras) to.",
+    )
+    parser.add_argument(
+        "--spec",
+        default=None,
+        help="A JSON file mapping hidden_layers, regularizer, optimizer and "
+        "batch_size to lists of values to try. (default: %s)" % DEFAULT_SPEC,
+    )
+    parser.add_argument(
+        "--random",
+        default=None,
+        type=int,
+        metavar="N",
+        help="Try N combinations chosen at random instead of all of them.",
+    )
+    parser.add_argument("--seed", default=0, type=int, help="(default: %(default)s)")
+    parser.add_argument(
+        "--epochs",
+        "-e",
+        default=DEFAULT_EPOCHS,
+        type=int,
+        help="(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=None,
+        type=int,
+        help="The number of trials to run at once. (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--min-epochs",
+        default=2,
+        type=int,
+        help="Epochs a trial runs before it can be stopped early. (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--min-trials",
+        default=3,
+        type=int,
+        help="Other trials that need to have reached an epoch before a trial "
+        "can be stopped for being worse than their median. (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--no-mirror",
+        action="store_true",
+        help="Train on each game once, from one team's perspective, instead of "
+        "from both teams' perspectives.",
+    )
+    parser.add_argument(
+        "--no-early-stopping",
+        action="store_true",
+        help="Run every trial for all of its epochs.",
+    )
+
+
+def main(args):
+    if args.validation_year in args.train_years:
+        raise Exception(
+            "Validation year %s is also a training year" % args.validation_year
+        )
+    spec = DEFAULT_SPEC if args.spec is None else load_spec(args.spec)
+    params = trial_params(spec, args.random, args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    # Loaded once into shared memory, which all of the workers read from
+    features, labels = load_data_multiyear(sorted(args.train_years))
+    if args.validation_year is None:
+        train_rows, validation_rows = validation_split(len(features), args.seed)
+        train = (features, labels, train_rows)
+        validation = (features, labels, validation_rows)
+    else:
+        train = (features, labels, np.arange(len(features)))
+        validation_features, validation_labels = load_data(args.validation_year)
+        validation = (
+            validation_features,
+            validation_labels,
+            np.arange(len(validation_features)),
+        )
+    print(
+        "Running %s trials on %s games (validating on %s)"
+        % (len(params), len(train[2]), len(validation[2]))
+    )
+
+    finished = []
+    for result in sweep(
+        params,
+        train,
+        validation,
+        args.out_dir,
+        args.epochs,
+        args.jobs,
+        args.min_epochs,
+        None if args.no_early_stopping else args.min_trials,
+        not args.no_mirror,
+    ):
+        finished.append(result)
+        print(
+            "[%d/%d] trial %d: log loss %.4f, accuracy %.4f after %d epochs%s"
+            % (
+                len(finished),
+                len(params),
+                result["trial"],
+                result["log_loss"],
+                result["accuracy"],
+                result["epochs"],
+                " (stopped early)" if result["stopped_early"] else "",
+            )
+        )
+
+    results = pd.DataFrame(finished, columns=COLUMNS).sort_values("log_loss")
+    results_path = os.path.join(args.out_dir, "results.csv")
+    results.to_csv(results_path, index=False, float_format="%.6f")
+    with pd.option_context("display.float_format", "{:.4f}".format):
+        print()
+        print(results.to_string(index=False))
+    print("Saved results to %s" % results_path)
+
+    best = results.iloc[0]
+    best_path = os.path.join(args.out_dir, "best.keras")
+    shutil.copyfile(trial_model_path(args.out_dir, best["trial"]), best_path)
+    print("Saved the best model (trial %d) to %s" % (best["trial"], best_path))
+    print(
+        "To retrain it: ./train.py --hidden-layers %s --regularizer %s "
+        "--optimizer %s -b %d"
+        % (
+            best["hidden_layers"],
+            best["regularizer"],
+            best["optimizer"],
+            best["batch_size"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -2,19 +2,30 @@
 import argparse
 import sys
 
-from keras.models import Sequential
-from keras.layers import Dense, Flatten
-
-from ncaa_predict.data_loader import load_data_multiyear, N_PLAYERS, N_FEATURES
+from ncaa_predict import profiling
+from ncaa_predict.data_loader import (
+    VALIDATION_FRACTION,
+    count_games,
+    validation_split,
+)
+from ncaa_predict.models import (
+    DEFAULT_HIDDEN_LAYERS,
+    DEFAULT_OPTIMIZER,
+    DEFAULT_REGULARIZER,
+    build_model,
+)
 from ncaa_predict.util import list_arg
 
 
+DESCRIPTION = "Train a model to predict which team wins a game."
+
 DEFAULT_BATCH_SIZE = 10000
 DEFAULT_STEPS = sys.maxsize
+DEFAULT_SHUFFLE_BUFFER = 50000
+DEFAULT_PARALLEL_READS = 4
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+def add_arguments(parser):
     parser.add_argument(
         "--batch_size",
         "-b",
@@ -48,38 +59,130 @@ if __name__ == "__main__":
         type=list_arg(type=int, container=frozenset),
         help="A comma-separated list of years to train on.",
     )
-    args = parser.parse_args()
-
-    model = Sequential(
-        [
-            Flatten(),
-            Dense(16, activation="relu", kernel_regularizer="L1L2"),
-            Dense(2, activation="softmax"),
-        ]
+    parser.add_argument(
+        "--validation-year",
+        "-p",
+        default=None,
+        type=int,
+        help="A year to validate on. (default: %d%%%% of the training games, "
+        "chosen at random)" % (VALIDATION_FRACTION * 100),
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="Seed for choosing the validation games without --validation-year. "
+        "sweep.py holds out the same games for the same seed. (default: "
+        "%(default)s)",
     )
-    model.compile(
-        loss="categorical_crossentropy",
-        optimizer="rmsprop",
-        metrics=["accuracy", "AUC", "Precision", "Recall"],
+    parser.add_argument(
+        "--shuffle-buffer",
+        default=DEFAULT_SHUFFLE_BUFFER,
+        type=int,
+        help="Number of games to shuffle across years at once. (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--parallel-reads",
+        default=DEFAULT_PARALLEL_READS,
+        type=int,
+        help="Number of years to read games from at once. (default: "
+        "%(default)s)",
     )
+    parser.add_argument(
+        "--no-mirror",
+        action="store_true",
+        help="Train on each game once, from one team's perspective, instead of "
+        "from both teams' perspectives.",
+    )
+    parser.add_argument(
+        "--hidden-layers",
+        default=DEFAULT_HIDDEN_LAYERS,
+        type=list_arg(type=int),
+        help="A comma-separated list of hidden layer sizes. (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--regularizer",
+        default=DEFAULT_REGULARIZER,
+        help="The Keras kernel regularizer for the hidden layers, or 'none'. "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--optimizer",
+        default=DEFAULT_OPTIMIZER,
+        help="The Keras optimizer. (default: %(default)s)",
+    )
+    profiling.add_argument(parser)
 
-    features, labels = load_data_multiyear(args.train_years)
-    try:
-        model.fit(
-            x=features,
-            y=labels,
-            batch_size=args.batch_size,
-            epochs=args.steps // args.batch_size,
+
+def main(args):
+    with profiling.profile(args.profile):
+        # This imports Keras, which takes a few seconds
+        with profiling.stage("import"):
+            from ncaa_predict.dataset import game_dataset
+
+        with profiling.stage("build_model"):
+            regularizer = args.regularizer
+            if regularizer.lower() == "none":
+                regularizer = None
+            model = build_model(args.hidden_layers, regularizer, args.optimizer)
+
+        if args.validation_year in args.train_years:
+            raise Exception(
+                "Validation year %s is also a training year" % args.validation_year
+            )
+        # Build any missing game tables in parallel before streaming from them
+        years = sorted(args.train_years)
+        if args.validation_year is not None:
+            years.append(args.validation_year)
+        counts = dict(zip(years, count_games(years)))
+        n_games = sum(counts[year] for year in args.train_years)
+        if args.validation_year is None:
+            train_rows, validation_rows = validation_split(n_games, args.seed)
+            validation_years = args.train_years
+        else:
+            train_rows, validation_rows = None, None
+            validation_years = [args.validation_year]
+        n_train = n_games if train_rows is None else len(train_rows)
+        print("Training on %s games" % n_train)
+
+        train_data = game_dataset(
+            args.train_years,
+            args.batch_size,
             shuffle=True,
-            validation_split=0.1,
+            shuffle_buffer=args.shuffle_buffer,
+            parallel_reads=args.parallel_reads,
+            rows=train_rows,
+            mirror=not args.no_mirror,
         )
-    except KeyboardInterrupt:
-        print("Stopped training due to keyboard interrupt")
-    if args.model_out is not None:
-        model.save(args.model_out)
+        validation_data = game_dataset(
+            validation_years,
+            args.batch_size,
+            parallel_reads=args.parallel_reads,
+            rows=validation_rows,
+        )
+        try:
+            with profiling.stage("fit"):
+                model.fit(
+                    train_data,
+                    validation_data=validation_data,
+                    epochs=args.steps // args.batch_size,
+                )
+        except KeyboardInterrupt:
+            print("Stopped training due to keyboard interrupt")
+        if args.model_out is not None:
+            with profiling.stage("save"):
+                model.save(args.model_out)
 
     # Workaround for TensorFlow bug:
     # https://github.com/tensorflow/tensorflow/issues/3388
     import gc
 
     gc.collect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    main(parser.parse_args())